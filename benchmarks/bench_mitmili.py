@@ -0,0 +1,191 @@
+"""Benchmarks for the Man in the Middle Light integration.
+
+Run with `pytest` from this directory. Results are written as JSON to
+results.json, or to the file named by MITMILI_BENCH_OUTPUT.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+import time
+import tracemalloc
+
+import pytest
+
+from homeassistant.const import ATTR_ENTITY_ID, SERVICE_TURN_ON
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
+from homeassistant.setup import async_setup_component
+
+from custom_components.mitmili.const import (
+    DATA_MITMILI,
+    SUFFIX_OVERRIDDEN,
+    SUFFIX_OVERRIDE,
+)
+
+from .common import (
+    add_config_entries,
+    async_add_source_lights,
+    async_setup_mitmili,
+    get_entity_id,
+    get_proxy_entity_id,
+)
+
+ENTRY_COUNTS = [10, 100, 1000]
+
+# Unrelated entity registry entries, to benchmark lookups in a large registry
+REGISTRY_PADDING = 5000
+
+LATENCY_SAMPLES = 200
+
+
+@pytest.mark.parametrize("count", ENTRY_COUNTS)
+async def bench_setup_entry(
+    hass: HomeAssistant, record: Callable[..., None], count: int
+) -> None:
+    """Measure setup time and memory per config entry."""
+    lights = await async_add_source_lights(hass, count)
+    await async_setup_mitmili(hass)
+    entries = add_config_entries(hass, lights)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for entry in entries:
+        assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done(wait_background_tasks=True)
+    elapsed = time.perf_counter() - start
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    record("setup_entry_time", elapsed / count * 1000, "ms/entry", entries=count)
+    record("setup_entry_memory", memory / count / 1024, "KiB/entry", entries=count)
+    # As measured by the integration itself, excluding the test harness
+    record(
+        "setup_entry_time_max",
+        hass.data[DATA_MITMILI].setup_duration_max * 1000,
+        "ms",
+        entries=count,
+    )
+
+
+async def bench_turn_on_latency(
+    hass: HomeAssistant, record: Callable[..., None]
+) -> None:
+    """Measure proxy turn_on latency with a large entity registry."""
+    ent_reg = er.async_get(hass)
+    for index in range(REGISTRY_PADDING):
+        ent_reg.async_get_or_create("sensor", "bench_padding", f"padding_{index}")
+
+    lights = await async_add_source_lights(hass, 1)
+    await async_setup_mitmili(hass)
+    (entry,) = add_config_entries(hass, lights)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done(wait_background_tasks=True)
+    proxy_entity_id = get_proxy_entity_id(hass, entry)
+
+    samples = []
+    for index in range(LATENCY_SAMPLES):
+        start = time.perf_counter()
+        await hass.services.async_call(
+            "light",
+            SERVICE_TURN_ON,
+            {ATTR_ENTITY_ID: proxy_entity_id, "brightness": index % 255 + 1},
+            blocking=True,
+        )
+        await hass.async_block_till_done(wait_background_tasks=True)
+        samples.append(time.perf_counter() - start)
+
+    samples.sort()
+    params = {"registry_entries": len(ent_reg.entities)}
+    record("turn_on_latency_p50", samples[len(samples) // 2] * 1000, "ms", **params)
+    record(
+        "turn_on_latency_p95", samples[int(len(samples) * 0.95)] * 1000, "ms", **params
+    )
+
+
+@pytest.mark.parametrize("count", ENTRY_COUNTS)
+async def bench_switch_fanout(
+    hass: HomeAssistant, record: Callable[..., None], count: int
+) -> None:
+    """Measure the cost of toggling overridden switches, including the sync."""
+    lights = await async_add_source_lights(hass, count)
+    await async_setup_mitmili(hass)
+    entries = add_config_entries(hass, lights)
+    for entry in entries:
+        assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done(wait_background_tasks=True)
+    switch_entity_ids = [
+        get_entity_id(hass, entry, SUFFIX_OVERRIDDEN) for entry in entries
+    ]
+
+    # Give the override lights a state of their own, so every toggle has to
+    # sync the source light. They are not active yet, so nothing is sent.
+    await hass.services.async_call(
+        "light",
+        SERVICE_TURN_ON,
+        {
+            ATTR_ENTITY_ID: [
+                get_entity_id(hass, entry, SUFFIX_OVERRIDE) for entry in entries
+            ],
+            "brightness": 100,
+        },
+        blocking=True,
+    )
+    await hass.async_block_till_done(wait_background_tasks=True)
+    assert not any(light.calls for light in lights)
+
+    start = time.perf_counter()
+    for switch_entity_id in switch_entity_ids:
+        await hass.services.async_call(
+            "switch", SERVICE_TURN_ON, {ATTR_ENTITY_ID: switch_entity_id}, blocking=True
+        )
+    await hass.async_block_till_done(wait_background_tasks=True)
+    elapsed = time.perf_counter() - start
+
+    record("switch_toggle_time", elapsed / count * 1000, "ms/toggle", entries=count)
+    record(
+        "switch_toggle_source_calls",
+        sum(light.calls for light in lights),
+        "calls",
+        entries=count,
+    )
+
+
+@pytest.mark.parametrize("count", ENTRY_COUNTS)
+async def bench_scene_activation(
+    hass: HomeAssistant, record: Callable[..., None], count: int
+) -> None:
+    """Measure throughput of a scene that sets all proxy lights at once."""
+    lights = await async_add_source_lights(hass, count)
+    await async_setup_mitmili(hass)
+    entries = add_config_entries(hass, lights)
+    for entry in entries:
+        assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done(wait_background_tasks=True)
+    proxy_entity_ids = [get_proxy_entity_id(hass, entry) for entry in entries]
+    assert await async_setup_component(hass, "scene", {})
+    await hass.async_block_till_done()
+
+    start = time.perf_counter()
+    await hass.services.async_call(
+        "scene",
+        "apply",
+        {
+            "entities": {
+                entity_id: {"state": "on", "brightness": 200}
+                for entity_id in proxy_entity_ids
+            }
+        },
+        blocking=True,
+    )
+    await hass.async_block_till_done(wait_background_tasks=True)
+    elapsed = time.perf_counter() - start
+
+    assert all(light.is_on for light in lights)
+    record("scene_activation_throughput", count / elapsed, "lights/s", entries=count)
+    record(
+        "scene_activation_source_calls",
+        sum(light.calls for light in lights),
+        "calls",
+        entries=count,
+    )
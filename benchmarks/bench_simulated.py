@@ -0,0 +1,173 @@
+"""Benchmarks against simulated source lights behind a congested mesh."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+import time
+
+import pytest
+
+from homeassistant.components.light import ColorMode
+from homeassistant.const import STATE_ON
+from homeassistant.core import HomeAssistant, State
+from homeassistant.setup import async_setup_component
+
+from custom_components.mitmili.const import (
+    CONF_BATCH_WINDOW,
+    CONF_RATE_LIMIT,
+    CONF_RESYNC_CONCURRENCY,
+    CONF_RESYNC_JITTER,
+)
+from custom_components.mitmili.light_state import LightState
+from pytest_homeassistant_custom_component.common import (
+    mock_restore_cache_with_extra_data,
+)
+
+from .common import add_config_entries, async_setup_mitmili, get_proxy_entity_id
+from .simulated import (
+    MeshProfile,
+    Settling,
+    SimulatedMesh,
+    async_add_simulated_lights,
+    async_wait_settled,
+)
+
+# A mesh that carries 200 calls per second, and loses one call in a hundred
+CONGESTED_MESH = MeshProfile(
+    latency=0.02,
+    jitter=0.02,
+    drop_rate=0.01,
+    report_delay=0.05,
+    max_rate=200,
+)
+
+SETTLE_TIMEOUT = 60.0
+
+
+def record_settling(
+    record: Callable[..., None],
+    name: str,
+    settling: Settling,
+    mesh: SimulatedMesh,
+    **params: object,
+) -> None:
+    """Record how the lights settled and what it took of the mesh."""
+    for percentage, elapsed in settling.reached.items():
+        record(f"{name}_time_to_{percentage}", elapsed, "s", **params)
+    record(f"{name}_last_settled", settling.last, "s", **params)
+    record(f"{name}_settled", settling.fraction * 100, "%", **params)
+    record(f"{name}_mesh_calls", mesh.calls, "calls", **params)
+    record(f"{name}_mesh_dropped", mesh.dropped, "calls", **params)
+    record(f"{name}_mesh_queue_delay_max", mesh.max_queue_delay * 1000, "ms", **params)
+
+
+@pytest.mark.parametrize("count", [100, 1000])
+@pytest.mark.parametrize("rate_limit", [0, 100])
+async def bench_congested_scene(
+    hass: HomeAssistant, record: Callable[..., None], count: int, rate_limit: float
+) -> None:
+    """Measure how a scene for all proxy lights settles on a congested mesh."""
+    lights, mesh = await async_add_simulated_lights(hass, count, CONGESTED_MESH)
+    await async_setup_mitmili(hass, **{CONF_RATE_LIMIT: rate_limit})
+    entries = add_config_entries(hass, lights)
+    for entry in entries:
+        assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done(wait_background_tasks=True)
+    proxy_entity_ids = [get_proxy_entity_id(hass, entry) for entry in entries]
+    assert await async_setup_component(hass, "scene", {})
+    await hass.async_block_till_done()
+
+    start = time.perf_counter()
+    await hass.services.async_call(
+        "scene",
+        "apply",
+        {
+            "entities": {
+                entity_id: {"state": "on", "brightness": 200}
+                for entity_id in proxy_entity_ids
+            }
+        },
+        blocking=True,
+    )
+    settling = await async_wait_settled(hass, lights, mesh, start, SETTLE_TIMEOUT)
+
+    record_settling(
+        record,
+        "congested_scene",
+        settling,
+        mesh,
+        entries=count,
+        rate_limit=rate_limit,
+    )
+
+
+@pytest.mark.parametrize("batch_window", [0, 0.05])
+async def bench_congested_toggle_burst(
+    hass: HomeAssistant, record: Callable[..., None], batch_window: float
+) -> None:
+    """Measure mesh load when proxy lights are changed repeatedly in a burst."""
+    count = 100
+    lights, mesh = await async_add_simulated_lights(hass, count, CONGESTED_MESH)
+    await async_setup_mitmili(hass, **{CONF_BATCH_WINDOW: batch_window})
+    entries = add_config_entries(hass, lights)
+    for entry in entries:
+        assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done(wait_background_tasks=True)
+    proxy_entity_ids = [get_proxy_entity_id(hass, entry) for entry in entries]
+
+    brightnesses = range(10, 260, 25)
+    start = time.perf_counter()
+    for brightness in brightnesses:
+        await hass.services.async_call(
+            "light",
+            "turn_on",
+            {"entity_id": proxy_entity_ids, "brightness": brightness},
+            blocking=True,
+        )
+    settling = await async_wait_settled(
+        hass, lights, mesh, start, SETTLE_TIMEOUT, brightness=brightnesses[-1]
+    )
+
+    record_settling(
+        record,
+        "congested_burst",
+        settling,
+        mesh,
+        entries=count,
+        batch_window=batch_window,
+    )
+
+
+@pytest.mark.parametrize("concurrency", [4, 32])
+async def bench_congested_resync(
+    hass: HomeAssistant, record: Callable[..., None], concurrency: int
+) -> None:
+    """Measure how restored proxy lights are synced to a congested mesh at startup."""
+    count = 1000
+    lights, mesh = await async_add_simulated_lights(hass, count, CONGESTED_MESH)
+    restored = LightState(
+        is_on=True, brightness=200, color_mode=ColorMode.COLOR_TEMP, color=2700
+    ).as_dict()
+    mock_restore_cache_with_extra_data(
+        hass,
+        [(State(f"{light.entity_id}_proxy", STATE_ON), restored) for light in lights],
+    )
+    add_config_entries(hass, lights)
+
+    start = time.perf_counter()
+    await async_setup_mitmili(
+        hass,
+        **{CONF_RESYNC_CONCURRENCY: concurrency, CONF_RESYNC_JITTER: 0.05},
+    )
+    settling = await async_wait_settled(
+        hass, lights, mesh, start, SETTLE_TIMEOUT, brightness=200
+    )
+
+    record_settling(
+        record,
+        "congested_resync",
+        settling,
+        mesh,
+        entries=count,
+        concurrency=concurrency,
+    )
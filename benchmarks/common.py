@@ -0,0 +1,153 @@
+"""Helpers for the Man in the Middle Light benchmarks."""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Sequence
+from typing import Any, TypeVar
+
+from homeassistant.components.light import (
+    ATTR_BRIGHTNESS,
+    ATTR_COLOR_TEMP_KELVIN,
+    ATTR_HS_COLOR,
+    ColorMode,
+    LightEntity,
+    LightEntityFeature,
+)
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType
+from homeassistant.setup import async_setup_component
+
+from custom_components.mitmili.const import (
+    CONF_RATE_LIMIT,
+    CONF_RESYNC_JITTER,
+    CONF_SOURCE_ENTITY_ID,
+    DOMAIN,
+    SUFFIX_OVERRIDDEN,
+    SUFFIX_PROXY,
+)
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    MockModule,
+    MockPlatform,
+    mock_integration,
+    mock_platform,
+)
+
+SOURCE_DOMAIN = "bench_source"
+
+
+class BenchSourceLight(LightEntity):
+    """Source light that applies commands instantly and counts them."""
+
+    _attr_should_poll = False
+    _attr_supported_color_modes = {ColorMode.COLOR_TEMP, ColorMode.HS}
+    _attr_supported_features = LightEntityFeature.EFFECT | LightEntityFeature.TRANSITION
+    _attr_effect_list = ["colorloop"]
+    _attr_min_color_temp_kelvin = 2000
+    _attr_max_color_temp_kelvin = 6500
+
+    def __init__(self, index: int) -> None:
+        """Initialize the light."""
+        self.entity_id = f"light.source_{index}"
+        self._attr_name = f"Source {index}"
+        self._attr_unique_id = f"source_{index}"
+        self._attr_is_on = False
+        self._attr_color_mode = ColorMode.COLOR_TEMP
+        self._attr_color_temp_kelvin = 2700
+        self.calls = 0
+
+    async def async_turn_on(self, **kwargs: Any) -> None:
+        """Turn on the light."""
+        self.calls += 1
+        self._apply_turn_on(kwargs)
+        self.async_write_ha_state()
+
+    async def async_turn_off(self, **kwargs: Any) -> None:
+        """Turn off the light."""
+        self.calls += 1
+        self._attr_is_on = False
+        self.async_write_ha_state()
+
+    def _apply_turn_on(self, kwargs: dict[str, Any]) -> None:
+        """Apply the attributes of a turn_on command."""
+        self._attr_is_on = True
+        if ATTR_BRIGHTNESS in kwargs:
+            self._attr_brightness = kwargs[ATTR_BRIGHTNESS]
+        if ATTR_HS_COLOR in kwargs:
+            self._attr_hs_color = kwargs[ATTR_HS_COLOR]
+            self._attr_color_mode = ColorMode.HS
+        if ATTR_COLOR_TEMP_KELVIN in kwargs:
+            self._attr_color_temp_kelvin = kwargs[ATTR_COLOR_TEMP_KELVIN]
+            self._attr_color_mode = ColorMode.COLOR_TEMP
+
+
+_LightT = TypeVar("_LightT", bound=BenchSourceLight)
+
+
+async def async_add_source_lights(
+    hass: HomeAssistant,
+    count: int,
+    factory: Callable[[int], _LightT] = BenchSourceLight,  # type: ignore[assignment]
+) -> list[_LightT]:
+    """Set up source lights, return the entities."""
+    lights = [factory(index) for index in range(count)]
+
+    async def async_setup_platform(
+        hass: HomeAssistant,
+        config: ConfigType,
+        async_add_entities: AddEntitiesCallback,
+        discovery_info: DiscoveryInfoType | None = None,
+    ) -> None:
+        async_add_entities(lights)
+
+    mock_integration(hass, MockModule(SOURCE_DOMAIN))
+    mock_platform(
+        hass,
+        f"{SOURCE_DOMAIN}.light",
+        MockPlatform(async_setup_platform=async_setup_platform),
+    )
+    assert await async_setup_component(
+        hass, "light", {"light": {"platform": SOURCE_DOMAIN}}
+    )
+    await hass.async_block_till_done()
+    return lights
+
+
+async def async_setup_mitmili(hass: HomeAssistant, **conf: Any) -> None:
+    """Set up the integration, by default without rate limits or resync delays."""
+    assert await async_setup_component(
+        hass, DOMAIN, {DOMAIN: {CONF_RATE_LIMIT: 0, CONF_RESYNC_JITTER: 0, **conf}}
+    )
+
+
+def add_config_entries(
+    hass: HomeAssistant, lights: Sequence[BenchSourceLight]
+) -> list[MockConfigEntry]:
+    """Add a config entry per source light, without setting them up."""
+    entries = []
+    for light in lights:
+        entry = MockConfigEntry(
+            domain=DOMAIN,
+            title=light.name,
+            options={CONF_SOURCE_ENTITY_ID: light.entity_id},
+        )
+        entry.add_to_hass(hass)
+        entries.append(entry)
+    return entries
+
+
+def get_entity_id(hass: HomeAssistant, entry: MockConfigEntry, suffix: str) -> str:
+    """Return the entity ID of one of the entities of an entry."""
+    domain = "switch" if suffix == SUFFIX_OVERRIDDEN else "light"
+    entity_id = er.async_get(hass).async_get_entity_id(
+        domain, DOMAIN, f"{entry.entry_id}_{suffix}"
+    )
+    assert entity_id is not None
+    return entity_id
+
+
+def get_proxy_entity_id(hass: HomeAssistant, entry: MockConfigEntry) -> str:
+    """Return the entity ID of the proxy light of an entry."""
+    return get_entity_id(hass, entry, SUFFIX_PROXY)
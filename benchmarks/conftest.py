@@ -0,0 +1,55 @@
+"""Fixtures for the Man in the Middle Light benchmarks."""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Generator
+import json
+import os
+from pathlib import Path
+import platform
+from typing import Any
+
+import pytest
+
+from homeassistant.const import __version__ as HA_VERSION
+
+RESULTS_FILE = Path(
+    os.environ.get("MITMILI_BENCH_OUTPUT", Path(__file__).parent / "results.json")
+)
+
+_results: list[dict[str, Any]] = []
+
+
+def pytest_sessionfinish(session: pytest.Session, exitstatus: int) -> None:
+    """Write all recorded results as JSON."""
+    if not _results:
+        return
+    RESULTS_FILE.write_text(
+        json.dumps(
+            {
+                "python": platform.python_version(),
+                "home_assistant": HA_VERSION,
+                "platform": platform.platform(),
+                "results": _results,
+            },
+            indent=2,
+        )
+    )
+
+
+@pytest.fixture
+def record() -> Callable[..., None]:
+    """Return a function to record a benchmark result."""
+
+    def _record(name: str, value: float, unit: str, **params: Any) -> None:
+        _results.append({"name": name, "value": value, "unit": unit, **params})
+
+    return _record
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(
+    enable_custom_integrations: None,
+) -> Generator[None]:
+    """Enable loading the integration from custom_components."""
+    yield
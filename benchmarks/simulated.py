@@ -0,0 +1,215 @@
+"""Simulated source lights behind a congested radio mesh.
+
+The lights run in-process, without hardware or network. Every service call
+is carried over a shared mesh that takes time to deliver it, can lose it,
+and carries a limited number of calls per second. Like a multicast, a call
+targeting several lights is a single transmission that reaches all of them
+or none. Calls arriving while the mesh is busy wait for a free slot, so like
+a real congested mesh the latency grows with the load.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+import random
+import time
+from typing import Any
+
+from homeassistant.components.light import ATTR_BRIGHTNESS
+from homeassistant.const import STATE_ON
+from homeassistant.core import Context, HomeAssistant
+
+from .common import BenchSourceLight, async_add_source_lights
+
+
+# Percentages of the lights of which the time until they settled is reported
+SETTLE_PERCENTAGES = (50, 90, 99, 100)
+
+
+@dataclass(frozen=True, slots=True)
+class MeshProfile:
+    """How the simulated mesh behaves."""
+
+    # Seconds it takes to deliver a call
+    latency: float = 0.0
+    # Random extra seconds added to the latency of every call, up to this many
+    jitter: float = 0.0
+    # Fraction of calls that are acknowledged but never reach the light
+    drop_rate: float = 0.0
+    # Seconds between a light applying a call and reporting its new state
+    report_delay: float = 0.0
+    # Calls per second the mesh carries, 0 for no limit
+    max_rate: float = 0.0
+    # Seed of the random generator, so runs can be repeated
+    seed: int = 0
+
+
+class SimulatedMesh:
+    """The medium shared by all simulated lights."""
+
+    def __init__(self, hass: HomeAssistant, profile: MeshProfile) -> None:
+        """Initialize the mesh."""
+        self.hass = hass
+        self.profile = profile
+        self._random = random.Random(profile.seed)
+        self._next_slot = 0.0
+        # Transmissions on their way, by the context of their service call
+        self._in_flight: dict[str, asyncio.Task[bool]] = {}
+        self.calls = 0
+        self.dropped = 0
+        # The longest a call waited for a free slot, in seconds
+        self.max_queue_delay = 0.0
+
+    @property
+    def idle(self) -> bool:
+        """Return if no call is on its way."""
+        return not self._in_flight
+
+    async def async_transmit(self, context: Context) -> bool:
+        """Carry a service call to a light, return if it arrived.
+
+        The lights targeted by the same service call share its transmission.
+        """
+        if (task := self._in_flight.get(context.id)) is None:
+            task = self._in_flight[context.id] = self.hass.async_create_task(
+                self._async_transmit(context.id)
+            )
+        return await asyncio.shield(task)
+
+    async def _async_transmit(self, context_id: str) -> bool:
+        """Carry a single transmission."""
+        try:
+            return await self._async_deliver()
+        finally:
+            del self._in_flight[context_id]
+
+    async def _async_deliver(self) -> bool:
+        """Wait for a free slot and the latency, return if the call arrived."""
+        profile = self.profile
+        self.calls += 1
+        delay = 0.0
+        if profile.max_rate:
+            now = self.hass.loop.time()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + 1 / profile.max_rate
+            delay = slot - now
+            self.max_queue_delay = max(self.max_queue_delay, delay)
+        delay += profile.latency + self._random.uniform(0, profile.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        if self._random.random() < profile.drop_rate:
+            self.dropped += 1
+            return False
+        return True
+
+
+class SimulatedLight(BenchSourceLight):
+    """Source light that is reached over a simulated mesh."""
+
+    def __init__(self, index: int, mesh: SimulatedMesh) -> None:
+        """Initialize the light."""
+        super().__init__(index)
+        self._mesh = mesh
+
+    async def async_turn_on(self, **kwargs: Any) -> None:
+        """Turn on the light, once the call has been carried."""
+        self.calls += 1
+        if await self._mesh.async_transmit(self._context_of_call()):
+            self._apply_turn_on(kwargs)
+            self._async_report()
+
+    async def async_turn_off(self, **kwargs: Any) -> None:
+        """Turn off the light, once the call has been carried."""
+        self.calls += 1
+        if await self._mesh.async_transmit(self._context_of_call()):
+            self._attr_is_on = False
+            self._async_report()
+
+    def _context_of_call(self) -> Context:
+        """Return the context of the service call being handled."""
+        # Set by the light service before it calls the entity
+        assert self._context is not None
+        return self._context
+
+    def _async_report(self) -> None:
+        """Report the new state, after the report delay of the mesh."""
+        if report_delay := self._mesh.profile.report_delay:
+            self.hass.loop.call_later(report_delay, self.async_write_ha_state)
+        else:
+            self.async_write_ha_state()
+
+
+async def async_add_simulated_lights(
+    hass: HomeAssistant, count: int, profile: MeshProfile
+) -> tuple[list[SimulatedLight], SimulatedMesh]:
+    """Set up simulated source lights sharing one mesh."""
+    mesh = SimulatedMesh(hass, profile)
+    lights = await async_add_source_lights(
+        hass, count, lambda index: SimulatedLight(index, mesh)
+    )
+    return lights, mesh
+
+
+@dataclass(slots=True)
+class Settling:
+    """How the lights settled after a command."""
+
+    # Seconds until a percentage of the lights had settled, by percentage
+    reached: dict[int, float]
+    # Seconds until the last light that settled did, 0 if none did
+    last: float
+    # Fraction of the lights that settled
+    fraction: float
+
+
+async def async_wait_settled(
+    hass: HomeAssistant,
+    lights: list[SimulatedLight],
+    mesh: SimulatedMesh,
+    start: float,
+    timeout: float,
+    brightness: int | None = None,
+    quiet: float = 1.0,
+    interval: float = 0.05,
+) -> Settling:
+    """Wait until the lights have reported being on, or cannot anymore.
+
+    With brightness, the lights also have to report that brightness. Lights
+    whose call was lost never settle, so the wait ends once the mesh has been
+    idle and no light settled for quiet seconds, or the timeout passed. Times
+    are in seconds since start, a time.perf_counter() value.
+    """
+
+    def settled() -> int:
+        return sum(
+            (state := hass.states.get(light.entity_id)) is not None
+            and state.state == STATE_ON
+            and (
+                brightness is None
+                or state.attributes.get(ATTR_BRIGHTNESS) == brightness
+            )
+            for light in lights
+        )
+
+    reached: dict[int, float] = {}
+    last = 0.0
+    count = 0
+    progress = time.perf_counter()
+    while True:
+        now = time.perf_counter()
+        if (current := settled()) > count:
+            count, last, progress = current, now - start, now
+            for percentage in SETTLE_PERCENTAGES:
+                if percentage not in reached and count * 100 >= percentage * len(
+                    lights
+                ):
+                    reached[percentage] = last
+        if (
+            count == len(lights)
+            or now - start >= timeout
+            or (mesh.idle and now - progress >= quiet)
+        ):
+            return Settling(reached, last, count / len(lights))
+        await asyncio.sleep(interval)
@@ -3,49 +3,238 @@
 from __future__ import annotations
 
 import logging
+import time
+
+import voluptuous as vol
+
+from homeassistant.config_entries import ConfigEntryError
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP, Platform
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.typing import ConfigType
+
+from .batcher import ServiceCallBatcher
+from .const import (
+    CONF_BATCH_WINDOW,
+    CONF_FADE_FRAME_RATE,
+    CONF_INTEGRATION_RATE_LIMITS,
+    CONF_MAX_QUEUED_COMMANDS,
+    CONF_OFFLINE_FLUSH_JITTER,
+    CONF_RATE_LIMIT,
+    CONF_RECONCILE_BUDGET,
+    CONF_RECONCILE_INTERVAL,
+    CONF_RECONCILE_JITTER,
+    CONF_RESYNC_CONCURRENCY,
+    CONF_RESYNC_JITTER,
+    CONF_TRACE,
+    CONF_TRACE_TIMEOUT,
+    DATA_MITMILI,
+    DEFAULT_BATCH_WINDOW,
+    DEFAULT_FADE_FRAME_RATE,
+    DEFAULT_MAX_QUEUED_COMMANDS,
+    DEFAULT_OFFLINE_FLUSH_JITTER,
+    DEFAULT_RATE_LIMIT,
+    DEFAULT_RECONCILE_INTERVAL,
+    DEFAULT_RECONCILE_JITTER,
+    DEFAULT_RESYNC_CONCURRENCY,
+    DEFAULT_RESYNC_JITTER,
+    DEFAULT_TRACE_TIMEOUT,
+    DOMAIN,
+)
+from .coordinator import (
+    MitmiliConfigEntry,
+    MitmiliCoordinator,
+    get_source_entity_ids,
+)
+from .expiry import OverrideExpiryScheduler
+from .models import MitmiliData
+from .reconciler import Reconciler
+from .resync import ResyncScheduler
+from .scheduler import CommandScheduler
+from .services import async_setup_services
+from .tracing import CommandTracer
+from .websocket_api import async_setup_websocket_api
 
-from homeassistant.config_entries import ConfigEntry, ConfigEntryError
-from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
+_LOGGER = logging.getLogger(__name__)
 
-from .const import CONF_SOURCE_ENTITY_ID
+PLATFORMS = [Platform.SWITCH, Platform.LIGHT, Platform.SENSOR]
+
+CONFIG_SCHEMA = vol.Schema(
+    {
+        DOMAIN: vol.Schema(
+            {
+                vol.Optional(
+                    CONF_BATCH_WINDOW, default=DEFAULT_BATCH_WINDOW
+                ): vol.All(vol.Coerce(float), vol.Range(min=0, max=1)),
+                vol.Optional(
+                    CONF_RATE_LIMIT, default=DEFAULT_RATE_LIMIT
+                ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Optional(CONF_INTEGRATION_RATE_LIMITS, default={}): {
+                    cv.string: vol.All(vol.Coerce(float), vol.Range(min=0.1))
+                },
+                vol.Optional(
+                    CONF_MAX_QUEUED_COMMANDS, default=DEFAULT_MAX_QUEUED_COMMANDS
+                ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                vol.Optional(
+                    CONF_RESYNC_CONCURRENCY, default=DEFAULT_RESYNC_CONCURRENCY
+                ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                vol.Optional(
+                    CONF_RESYNC_JITTER, default=DEFAULT_RESYNC_JITTER
+                ): vol.All(vol.Coerce(float), vol.Range(min=0, max=60)),
+                vol.Optional(
+                    CONF_OFFLINE_FLUSH_JITTER, default=DEFAULT_OFFLINE_FLUSH_JITTER
+                ): vol.All(vol.Coerce(float), vol.Range(min=0, max=300)),
+                vol.Optional(
+                    CONF_FADE_FRAME_RATE, default=DEFAULT_FADE_FRAME_RATE
+                ): vol.All(vol.Coerce(float), vol.Range(min=0.1, max=20)),
+                vol.Optional(CONF_RECONCILE_BUDGET, default=0): vol.All(
+                    vol.Coerce(float), vol.Range(min=0)
+                ),
+                vol.Optional(
+                    CONF_RECONCILE_INTERVAL, default=DEFAULT_RECONCILE_INTERVAL
+                ): vol.All(vol.Coerce(float), vol.Range(min=10)),
+                vol.Optional(
+                    CONF_RECONCILE_JITTER, default=DEFAULT_RECONCILE_JITTER
+                ): vol.All(vol.Coerce(float), vol.Range(min=0, max=60)),
+                vol.Optional(CONF_TRACE, default=False): cv.boolean,
+                vol.Optional(
+                    CONF_TRACE_TIMEOUT, default=DEFAULT_TRACE_TIMEOUT
+                ): vol.All(vol.Coerce(float), vol.Range(min=1, max=300)),
+            }
+        )
+    },
+    extra=vol.ALLOW_EXTRA,
+)
 
-_LOGGER = logging.getLogger(__name__)
 
-PLATFORMS = [Platform.SWITCH, Platform.LIGHT]
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the integration-wide runtime data."""
+    conf = config.get(DOMAIN, {})
+
+    scheduler = CommandScheduler(
+        hass,
+        conf.get(CONF_RATE_LIMIT, DEFAULT_RATE_LIMIT),
+        conf.get(CONF_INTEGRATION_RATE_LIMITS, {}),
+        conf.get(CONF_MAX_QUEUED_COMMANDS, DEFAULT_MAX_QUEUED_COMMANDS),
+    )
+    batcher = ServiceCallBatcher(
+        hass, conf.get(CONF_BATCH_WINDOW, DEFAULT_BATCH_WINDOW)
+    )
+    resync = ResyncScheduler(
+        hass,
+        conf.get(CONF_RESYNC_CONCURRENCY, DEFAULT_RESYNC_CONCURRENCY),
+        conf.get(CONF_RESYNC_JITTER, DEFAULT_RESYNC_JITTER),
+    )
+    data = hass.data[DATA_MITMILI] = MitmiliData(
+        hass=hass,
+        scheduler=scheduler,
+        batcher=batcher,
+        resync=resync,
+        expiry=OverrideExpiryScheduler(hass),
+        tracer=(
+            CommandTracer(
+                hass, conf.get(CONF_TRACE_TIMEOUT, DEFAULT_TRACE_TIMEOUT)
+            )
+            if conf.get(CONF_TRACE)
+            else None
+        ),
+        reconciler=(
+            Reconciler(
+                hass,
+                conf[CONF_RECONCILE_BUDGET],
+                conf.get(CONF_RECONCILE_INTERVAL, DEFAULT_RECONCILE_INTERVAL),
+                conf.get(CONF_RECONCILE_JITTER, DEFAULT_RECONCILE_JITTER),
+            )
+            if conf.get(CONF_RECONCILE_BUDGET)
+            else None
+        ),
+        fade_frame_rate=conf.get(CONF_FADE_FRAME_RATE, DEFAULT_FADE_FRAME_RATE),
+        offline_flush_jitter=conf.get(
+            CONF_OFFLINE_FLUSH_JITTER, DEFAULT_OFFLINE_FLUSH_JITTER
+        ),
+    )
+
+    @callback
+    def _async_shutdown(event: Event) -> None:
+        """Stop sending commands to the source lights."""
+        data.async_shutdown()
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_shutdown)
+
+    async_setup_services(hass)
+    async_setup_websocket_api(hass)
+
+    return True
 
 
-async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+async def async_setup_entry(hass: HomeAssistant, entry: MitmiliConfigEntry) -> bool:
     """Set up Man in the Middle Light from a config entry."""
-    # Validate that the source entity exists
-    source_entity_id = entry.options.get(CONF_SOURCE_ENTITY_ID) or entry.data.get(
-        CONF_SOURCE_ENTITY_ID
-    )
+    start = time.monotonic()
 
-    if not source_entity_id:
+    # Validate that the source entities exist
+    source_entity_ids = get_source_entity_ids(entry)
+
+    if not source_entity_ids:
         raise ConfigEntryError("Source entity ID not found in configuration")
 
-    # Log a warning if source entity doesn't exist yet, but allow setup to continue
+    # Log a warning if a source entity doesn't exist yet, but allow setup to continue
     # Entities will show as unavailable until the source entity becomes available
-    if not hass.states.get(source_entity_id):
-        _LOGGER.warning(
-            "Source light entity '%s' not found yet. "
-            "Proxy entities will be unavailable until the source entity is loaded",
-            source_entity_id,
-        )
+    for source_entity_id in source_entity_ids:
+        if not hass.states.get(source_entity_id):
+            _LOGGER.warning(
+                "Source light entity '%s' not found yet. "
+                "Proxy entities will be unavailable until the source entity is loaded",
+                source_entity_id,
+            )
+
+    entry.runtime_data = MitmiliCoordinator(hass, entry, source_entity_ids)
+    entry.async_on_unload(entry.runtime_data.async_start())
+    entry.async_on_unload(
+        hass.data[DATA_MITMILI].async_add_coordinator(entry.runtime_data)
+    )
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
     entry.async_on_unload(entry.add_update_listener(config_entry_update_listener))
 
+    # Commands are held back until the entry is released, staged with all
+    # other entries so the source lights are not flooded
+    resync = hass.data[DATA_MITMILI].resync
+    resync.async_schedule(entry.runtime_data)
+    entry.async_on_unload(lambda: resync.async_unschedule(entry.runtime_data))
+
+    # Drift is only healed once the entry has been released
+    if (reconciler := hass.data[DATA_MITMILI].reconciler) is not None:
+        reconciler.async_register(entry.runtime_data)
+        entry.async_on_unload(
+            lambda: reconciler.async_unregister(entry.runtime_data)
+        )
+
+    # Timed overrides are scheduled again when the overridden switch is restored
+    expiry = hass.data[DATA_MITMILI].expiry
+    entry.async_on_unload(lambda: expiry.async_cancel(entry.runtime_data))
+
+    duration = time.monotonic() - start
+    entry.runtime_data.setup_duration = duration
+    hass.data[DATA_MITMILI].async_record_setup(duration)
+    _LOGGER.debug("Set up %s in %.3f seconds", entry.title, duration)
+
     return True
 
 
-async def config_entry_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
-    """Update listener, called when the config entry options are changed."""
-    await hass.config_entries.async_reload(entry.entry_id)
+async def config_entry_update_listener(
+    hass: HomeAssistant, entry: MitmiliConfigEntry
+) -> None:
+    """Update listener, called when the config entry options are changed.
+
+    Most options are applied to the live entities, so their state is kept and
+    nothing is sent to the source light unless it changed. Only a change of the
+    layers, which adds or removes entities, reloads the entry.
+    """
+    if not entry.runtime_data.async_apply_options():
+        await hass.config_entries.async_reload(entry.entry_id)
 
 
-async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+async def async_unload_entry(hass: HomeAssistant, entry: MitmiliConfigEntry) -> bool:
     """Unload a config entry."""
     return await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
@@ -0,0 +1,171 @@
+"""Batching of outgoing light service calls for Man in the Middle Light."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, field
+import logging
+from typing import Any
+
+from homeassistant.components.light import DOMAIN as LIGHT_DOMAIN
+from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.core import Context, HomeAssistant, callback
+
+_LOGGER = logging.getLogger(__name__)
+
+CallKey = tuple[str, tuple[tuple[str, Any], ...]]
+
+# Number of contexts of sent calls remembered to recognise their state changes
+_MAX_CONTEXTS = 1024
+
+# Seconds a call may take before it counts as failed, so a source light that
+# does not respond does not hold up the lights it is batched with
+_CALL_TIMEOUT = 30
+
+
+def _freeze(data: Mapping[str, Any]) -> tuple[tuple[str, Any], ...]:
+    """Return a hashable representation of service data."""
+    return tuple(
+        sorted(
+            (key, tuple(value) if isinstance(value, list) else value)
+            for key, value in data.items()
+        )
+    )
+
+
+def call_key(service: str, data: Mapping[str, Any]) -> CallKey:
+    """Return the key of a call, calls with the same key are merged."""
+    return (service, _freeze(data))
+
+
+@dataclass(slots=True)
+class _PendingCall:
+    """A light service call that is waiting to be sent."""
+
+    service: str
+    data: dict[str, Any]
+    # Dict used as an ordered set
+    entity_ids: dict[str, None] = field(default_factory=dict)
+    futures: list[asyncio.Future[bool]] = field(default_factory=list)
+    context: Context = field(default_factory=Context)
+
+
+class ServiceCallBatcher:
+    """Merge light service calls with identical service data.
+
+    Calls queued within the same batch window (by default: the same event loop
+    iteration) that share the service and service data are sent as a single
+    call targeting all their entity IDs, so groups and integrations that support
+    multicast receive one command instead of one per light.
+    """
+
+    def __init__(self, hass: HomeAssistant, window: float) -> None:
+        """Initialize the batcher."""
+        self.hass = hass
+        self._window = window
+        self._pending: dict[CallKey, _PendingCall] = {}
+        self._flush_handle: asyncio.Handle | None = None
+        # Contexts of recently sent calls, dict used as an ordered set
+        self._contexts: dict[str, None] = {}
+        # Calls saved by sending them as part of a multi-entity call
+        self.merged = 0
+
+    @callback
+    def async_is_own_context(self, context: Context) -> bool:
+        """Return if a context belongs to a call sent by the batcher."""
+        return context.id in self._contexts or (
+            context.parent_id is not None and context.parent_id in self._contexts
+        )
+
+    @callback
+    def async_queue(
+        self, service: str, entity_ids: Iterable[str], data: Mapping[str, Any]
+    ) -> tuple[asyncio.Future[bool], Context]:
+        """Queue a light service call for one or more entities.
+
+        Returns a future that is resolved once the batch containing the call
+        has been handled by the source lights, with whether the call succeeded,
+        and the context the call is sent with.
+        """
+        key = call_key(service, data)
+        if (pending := self._pending.get(key)) is None:
+            pending = self._pending[key] = _PendingCall(service, dict(data))
+        pending.entity_ids.update(dict.fromkeys(entity_ids))
+
+        future: asyncio.Future[bool] = self.hass.loop.create_future()
+        pending.futures.append(future)
+
+        if self._flush_handle is None:
+            if self._window > 0:
+                self._flush_handle = self.hass.loop.call_later(
+                    self._window, self._async_flush
+                )
+            else:
+                self._flush_handle = self.hass.loop.call_soon(self._async_flush)
+
+        return future, pending.context
+
+    @callback
+    def _async_flush(self) -> None:
+        """Send all pending calls."""
+        self._flush_handle = None
+        pending, self._pending = self._pending, {}
+        for call in pending.values():
+            self.hass.async_create_background_task(
+                self._async_send(call), f"mitmili batched light.{call.service}"
+            )
+
+    async def _async_send(self, call: _PendingCall) -> None:
+        """Send a single, possibly merged, light service call."""
+        entity_ids = list(call.entity_ids)
+        if len(entity_ids) > 1:
+            self.merged += len(entity_ids) - 1
+            _LOGGER.debug(
+                "Merged light.%s for %d lights: %s",
+                call.service,
+                len(entity_ids),
+                entity_ids,
+            )
+
+        # Remember the context, so the state changes it causes can be recognised
+        context = call.context
+        self._contexts[context.id] = None
+        if len(self._contexts) > _MAX_CONTEXTS:
+            del self._contexts[next(iter(self._contexts))]
+
+        success = False
+        try:
+            async with asyncio.timeout(_CALL_TIMEOUT):
+                await self.hass.services.async_call(
+                    LIGHT_DOMAIN,
+                    call.service,
+                    {ATTR_ENTITY_ID: entity_ids, **call.data},
+                    blocking=True,
+                    context=context,
+                )
+            success = True
+        except TimeoutError:
+            _LOGGER.error(
+                "Timeout calling light.%s for %s after %s seconds",
+                call.service,
+                entity_ids,
+                _CALL_TIMEOUT,
+            )
+        except Exception as err:  # noqa: BLE001
+            # Invalid service data is raised by the light service as is, and
+            # must not escape from the task
+            _LOGGER.error(
+                "Error calling light.%s for %s: %s", call.service, entity_ids, err
+            )
+        finally:
+            for future in call.futures:
+                if not future.done():
+                    future.set_result(success)
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Flush pending calls immediately."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._async_flush()
@@ -0,0 +1,122 @@
+"""Capabilities of source lights for the Man in the Middle Light integration."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+from homeassistant.components.light import (
+    ATTR_EFFECT_LIST,
+    ATTR_MAX_COLOR_TEMP_KELVIN,
+    ATTR_MIN_COLOR_TEMP_KELVIN,
+    ATTR_SUPPORTED_COLOR_MODES,
+    ColorMode,
+    LightEntityFeature,
+)
+from homeassistant.const import ATTR_SUPPORTED_FEATURES
+
+# State attributes that describe what a light can do
+CAPABILITY_ATTRS = (
+    ATTR_SUPPORTED_COLOR_MODES,
+    ATTR_SUPPORTED_FEATURES,
+    ATTR_MIN_COLOR_TEMP_KELVIN,
+    ATTR_MAX_COLOR_TEMP_KELVIN,
+    ATTR_EFFECT_LIST,
+)
+
+
+def capabilities_changed(old: Mapping[str, Any], new: Mapping[str, Any]) -> bool:
+    """Return if any capability attribute differs between two attribute sets."""
+    return any(old.get(attr) != new.get(attr) for attr in CAPABILITY_ATTRS)
+
+
+@dataclass(frozen=True, slots=True)
+class LightCapabilities:
+    """What a source light supports."""
+
+    supported_color_modes: frozenset[ColorMode]
+    supported_features: LightEntityFeature
+    min_color_temp_kelvin: int | None
+    max_color_temp_kelvin: int | None
+    effect_list: tuple[str, ...] | None
+
+    @classmethod
+    def from_attributes(cls, attributes: Mapping[str, Any]) -> LightCapabilities:
+        """Return the capabilities described by light state attributes."""
+        supported_color_modes = frozenset(
+            ColorMode(mode)
+            for mode in attributes.get(ATTR_SUPPORTED_COLOR_MODES) or ()
+        ) or frozenset({ColorMode.ONOFF})
+
+        # The color temperature range only applies with color temperature
+        min_kelvin = max_kelvin = None
+        if ColorMode.COLOR_TEMP in supported_color_modes:
+            min_kelvin = attributes.get(ATTR_MIN_COLOR_TEMP_KELVIN)
+            max_kelvin = attributes.get(ATTR_MAX_COLOR_TEMP_KELVIN)
+
+        effect_list = attributes.get(ATTR_EFFECT_LIST)
+
+        return cls(
+            supported_color_modes=supported_color_modes,
+            supported_features=LightEntityFeature(
+                attributes.get(ATTR_SUPPORTED_FEATURES, 0)
+            ),
+            min_color_temp_kelvin=min_kelvin,
+            max_color_temp_kelvin=max_kelvin,
+            effect_list=tuple(effect_list) if effect_list else None,
+        )
+
+    @classmethod
+    def intersection(
+        cls, members: Iterable[LightCapabilities]
+    ) -> LightCapabilities | None:
+        """Return the capabilities all members have in common."""
+        members = list(members)
+        if not members:
+            return None
+        if len(members) == 1:
+            return members[0]
+
+        supported_color_modes = frozenset.intersection(
+            *(member.supported_color_modes for member in members)
+        )
+        if not supported_color_modes:
+            # Dimming is still common if no member is on/off only
+            supported_color_modes = frozenset(
+                {
+                    ColorMode.ONOFF
+                    if any(
+                        member.supported_color_modes == {ColorMode.ONOFF}
+                        for member in members
+                    )
+                    else ColorMode.BRIGHTNESS
+                }
+            )
+
+        supported_features = members[0].supported_features
+        for member in members[1:]:
+            supported_features &= member.supported_features
+
+        min_kelvin = max_kelvin = None
+        if ColorMode.COLOR_TEMP in supported_color_modes:
+            mins = [m.min_color_temp_kelvin for m in members]
+            maxs = [m.max_color_temp_kelvin for m in members]
+            if None not in mins and None not in maxs:
+                min_kelvin = max(mins)  # type: ignore[type-var]
+                max_kelvin = min(maxs)  # type: ignore[type-var]
+
+        effect_list: tuple[str, ...] | None = None
+        if all(member.effect_list for member in members):
+            common = set.intersection(*(set(m.effect_list or ()) for m in members))
+            effect_list = tuple(
+                effect for effect in members[0].effect_list or () if effect in common
+            ) or None
+
+        return cls(
+            supported_color_modes=supported_color_modes,
+            supported_features=supported_features,
+            min_color_temp_kelvin=min_kelvin,
+            max_color_temp_kelvin=max_kelvin,
+            effect_list=effect_list,
+        )
@@ -10,29 +10,87 @@ import voluptuous as vol
 from homeassistant.components.light import DOMAIN as LIGHT_DOMAIN
 from homeassistant.helpers import selector
 from homeassistant.helpers.schema_config_entry_flow import (
+    SchemaCommonFlowHandler,
     SchemaConfigFlowHandler,
+    SchemaFlowError,
     SchemaFlowFormStep,
     SchemaFlowMenuStep,
+    SchemaOptionsFlowHandler,
 )
 
-from .const import CONF_SOURCE_ENTITY_ID, DOMAIN
+from .const import (
+    CONF_CROSSFADE,
+    CONF_LAYERS,
+    CONF_MIRROR_SOURCE,
+    CONF_SOURCE_ENTITY_ID,
+    DOMAIN,
+)
+from .coordinator import get_source_entity_ids
 
 CONFIG_SCHEMA = vol.Schema(
     {
         vol.Required(CONF_SOURCE_ENTITY_ID): selector.EntitySelector(
-            selector.EntitySelectorConfig(domain=LIGHT_DOMAIN)
+            selector.EntitySelectorConfig(domain=LIGHT_DOMAIN, multiple=True)
         ),
     }
 )
 
-OPTIONS_SCHEMA = CONFIG_SCHEMA
+OPTIONS_SCHEMA = CONFIG_SCHEMA.extend(
+    {
+        vol.Optional(CONF_LAYERS, default=[]): selector.TextSelector(
+            selector.TextSelectorConfig(multiple=True)
+        ),
+        vol.Optional(CONF_MIRROR_SOURCE, default=False): selector.BooleanSelector(),
+        vol.Optional(CONF_CROSSFADE, default=0): selector.NumberSelector(
+            selector.NumberSelectorConfig(
+                min=0,
+                max=60,
+                step=0.5,
+                unit_of_measurement="s",
+                mode=selector.NumberSelectorMode.BOX,
+            )
+        ),
+    }
+)
+
+
+async def validate_source_entity_ids(
+    handler: SchemaCommonFlowHandler, user_input: dict[str, Any]
+) -> dict[str, Any]:
+    """Reject source lights that another entry already controls.
+
+    A light in two entries would be sent commands by two pipelines, that do
+    not know about each other's commands.
+    """
+    selected = user_input[CONF_SOURCE_ENTITY_ID]
+    if isinstance(selected, str):
+        selected = [selected]
+    parent = handler.parent_handler
+    own_entry_id = (
+        parent.config_entry.entry_id
+        if isinstance(parent, SchemaOptionsFlowHandler)
+        else None
+    )
+    for entry in parent.hass.config_entries.async_entries(
+        DOMAIN, include_ignore=False
+    ):
+        if entry.entry_id != own_entry_id and not set(selected).isdisjoint(
+            get_source_entity_ids(entry)
+        ):
+            raise SchemaFlowError("source_in_use")
+    return user_input
+
 
 CONFIG_FLOW: dict[str, SchemaFlowFormStep | SchemaFlowMenuStep] = {
-    "user": SchemaFlowFormStep(CONFIG_SCHEMA)
+    "user": SchemaFlowFormStep(
+        CONFIG_SCHEMA, validate_user_input=validate_source_entity_ids
+    )
 }
 
 OPTIONS_FLOW: dict[str, SchemaFlowFormStep | SchemaFlowMenuStep] = {
-    "init": SchemaFlowFormStep(OPTIONS_SCHEMA)
+    "init": SchemaFlowFormStep(
+        OPTIONS_SCHEMA, validate_user_input=validate_source_entity_ids
+    )
 }
 
 
@@ -44,15 +102,22 @@ class ConfigFlowHandler(SchemaConfigFlowHandler, domain=DOMAIN):
 
     def async_config_entry_title(self, options: Mapping[str, Any]) -> str:
         """Return config entry title."""
-        # Get the source entity name from the entity registry
-        entity_id = options.get(CONF_SOURCE_ENTITY_ID)
-        if entity_id:
+        # Name the entry after the first source light
+        entity_ids = options.get(CONF_SOURCE_ENTITY_ID)
+        if isinstance(entity_ids, str):
+            entity_ids = [entity_ids]
+        if entity_ids:
+            entity_id = entity_ids[0]
             # Get entity name from state
             state = self.hass.states.get(entity_id)
             if state and state.name:
-                return state.name
-            # Fallback to entity_id friendly name
-            return entity_id.split(".")[-1].replace("_", " ").title()
+                title = state.name
+            else:
+                # Fallback to entity_id friendly name
+                title = entity_id.split(".")[-1].replace("_", " ").title()
+            if len(entity_ids) > 1:
+                title = f"{title} (+{len(entity_ids) - 1})"
+            return title
         return "Man in the Middle Light"
 
     async def async_step_user(
@@ -62,13 +127,21 @@ class ConfigFlowHandler(SchemaConfigFlowHandler, domain=DOMAIN):
         errors = {}
 
         if user_input is not None:
-            # Validate the source entity exists
-            source_entity_id = user_input[CONF_SOURCE_ENTITY_ID]
-            if not self.hass.states.get(source_entity_id):
+            # Validate the source entities exist
+            source_entity_ids = user_input[CONF_SOURCE_ENTITY_ID]
+            if isinstance(source_entity_ids, str):
+                source_entity_ids = [source_entity_ids]
+            if not source_entity_ids or not all(
+                self.hass.states.get(entity_id) for entity_id in source_entity_ids
+            ):
                 errors["base"] = "entity_not_found"
             else:
-                # Check for duplicate config entries with same source entity
-                self._async_abort_entries_match({CONF_SOURCE_ENTITY_ID: source_entity_id})
+                # An entry with the same source lights already exists, one
+                # with only some of them is rejected by the form
+                selected = set(source_entity_ids)
+                for entry in self._async_current_entries(include_ignore=False):
+                    if set(get_source_entity_ids(entry)) == selected:
+                        return self.async_abort(reason="already_configured")
 
         # If no errors, continue with default schema flow
         if user_input is not None and not errors:
@@ -1,11 +1,71 @@
 """Constants for the Man in the Middle Light integration."""
 
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from homeassistant.util.hass_dict import HassKey
+
+if TYPE_CHECKING:
+    from .models import MitmiliData
+
 DOMAIN = "mitmili"
 
+DATA_MITMILI: HassKey[MitmiliData] = HassKey(DOMAIN)
+
 # Configuration
 CONF_SOURCE_ENTITY_ID = "source_entity_id"
+CONF_LAYERS = "layers"
+CONF_MIRROR_SOURCE = "mirror_source"
+CONF_CROSSFADE = "crossfade"
+
+# Integration-wide YAML configuration
+CONF_BATCH_WINDOW = "batch_window"
+CONF_FADE_FRAME_RATE = "fade_frame_rate"
+CONF_INTEGRATION_RATE_LIMITS = "integration_rate_limits"
+CONF_MAX_QUEUED_COMMANDS = "max_queued_commands"
+CONF_OFFLINE_FLUSH_JITTER = "offline_flush_jitter"
+CONF_RATE_LIMIT = "rate_limit"
+CONF_RECONCILE_BUDGET = "reconcile_budget"
+CONF_RECONCILE_INTERVAL = "reconcile_interval"
+CONF_RECONCILE_JITTER = "reconcile_jitter"
+CONF_RESYNC_CONCURRENCY = "resync_concurrency"
+CONF_RESYNC_JITTER = "resync_jitter"
+CONF_TRACE = "trace"
+CONF_TRACE_TIMEOUT = "trace_timeout"
+
+DEFAULT_BATCH_WINDOW = 0.0
+DEFAULT_FADE_FRAME_RATE = 2.0
+DEFAULT_MAX_QUEUED_COMMANDS = 100
+DEFAULT_OFFLINE_FLUSH_JITTER = 2.0
+DEFAULT_RATE_LIMIT = 20.0
+DEFAULT_RECONCILE_INTERVAL = 300.0
+DEFAULT_RECONCILE_JITTER = 1.0
+DEFAULT_RESYNC_CONCURRENCY = 4
+DEFAULT_RESYNC_JITTER = 0.5
+DEFAULT_TRACE_TIMEOUT = 10.0
+
+# Services
+SERVICE_SET_OVERRIDDEN = "set_overridden"
+
+ATTR_OVERRIDDEN = "overridden"
+ATTR_DURATION = "duration"
+ATTR_UNTIL = "until"
+
+# Events
+EVENT_COMMAND_TRACED = f"{DOMAIN}_command_traced"
+
+# State attributes
+ATTR_SOURCE_CALLS_SENT = "source_calls_sent"
+ATTR_SOURCE_CALLS_SKIPPED = "source_calls_skipped"
+ATTR_EXPIRES_AT = "expires_at"
+
+# Layers, additional layers configured for an entry follow the override layer
+LAYER_PROXY = 0
+LAYER_OVERRIDE = 1
 
 # Suffixes
 SUFFIX_PROXY = "proxy"
 SUFFIX_OVERRIDE = "override"
 SUFFIX_OVERRIDDEN = "overridden"
+SUFFIX_ACTIVE = "active"
@@ -0,0 +1,503 @@
+"""Per-entry runtime coordinator for the Man in the Middle Light integration."""
+
+from __future__ import annotations
+
+from datetime import datetime
+import logging
+from typing import TYPE_CHECKING
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import (
+    SERVICE_TURN_OFF,
+    SERVICE_TURN_ON,
+    STATE_UNAVAILABLE,
+)
+from homeassistant.core import (
+    CALLBACK_TYPE,
+    Event,
+    EventStateChangedData,
+    HomeAssistant,
+    callback,
+)
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.device import async_entity_id_to_device
+from homeassistant.helpers.device_registry import DeviceEntry
+from homeassistant.helpers.event import async_track_state_change_event
+from homeassistant.util import slugify
+
+from .capabilities import LightCapabilities, capabilities_changed
+from .const import (
+    CONF_CROSSFADE,
+    CONF_LAYERS,
+    CONF_MIRROR_SOURCE,
+    CONF_SOURCE_ENTITY_ID,
+    DATA_MITMILI,
+    LAYER_OVERRIDE,
+    LAYER_PROXY,
+    SUFFIX_OVERRIDE,
+    SUFFIX_PROXY,
+)
+from .pipeline import SourceCommandPipeline, diff_against_state
+from .scheduler import CommandPriority
+from .stats import EntryStats
+
+if TYPE_CHECKING:
+    from .light import ProxyLight
+    from .switch import ProxyOverriddenSwitch
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class MitmiliCoordinator:
+    """Own the layer stack and link the entities of a config entry.
+
+    An entry has a stack of layers, each with its own light. The proxy light
+    is the bottom layer and always enabled, the override light is the layer
+    above it, enabled by the overridden switch. Additional layers configured
+    for the entry follow, each enabled by its own switch. The highest enabled
+    layer controls the source light. Enabled layers are kept as a bitmask, so
+    finding the active layer does not depend on the number of layers.
+
+    The switches and lights talk to each other through the coordinator instead
+    of through the state machine, so toggling a switch calls the light that
+    became active directly.
+
+    The coordinator also watches the source lights once for all lights,
+    and updates their capabilities when those of the source lights change. With
+    multiple source lights, the proxy lights get the capabilities all source
+    lights have in common.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        source_entity_ids: tuple[str, ...],
+    ) -> None:
+        """Initialize the coordinator."""
+        self.hass = hass
+        self.entry = entry
+        self.source_entity_ids = source_entity_ids
+        self.pipeline: SourceCommandPipeline = hass.data[
+            DATA_MITMILI
+        ].async_get_pipeline(source_entity_ids)
+        self.layers = get_layers(entry)
+        self.mirror: bool = entry.options.get(CONF_MIRROR_SOURCE, False)
+        # Seconds the source light takes to fade to a light that became active
+        self.crossfade: float = entry.options.get(CONF_CROSSFADE, 0)
+        # When the override layer is disabled again, if it is timed
+        self.override_expires: datetime | None = None
+        layer_count = LAYER_OVERRIDE + 1 + len(self.layers)
+        self.lights: list[ProxyLight | None] = [None] * layer_count
+        self.switches: list[ProxyOverriddenSwitch | None] = [None] * layer_count
+        # Bit n is set if layer n is enabled, the proxy layer always is
+        self._enabled = 1 << LAYER_PROXY
+        self.capabilities: LightCapabilities | None = None
+        self._member_capabilities: dict[str, LightCapabilities] = {}
+        self.stats = EntryStats()
+        # Commands are held back until the resync scheduler releases the entry
+        self.ready = False
+        self.resync_needed = False
+        # The device is looked up once and shared by all entities of the entry
+        self.device = self._async_resolve_device()
+        self._unsub_track: CALLBACK_TYPE | None = None
+        self._unsub_registry: CALLBACK_TYPE | None = None
+        self.setup_duration: float | None = None
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        """Start tracking the source lights, return a callback to stop."""
+        self._async_track_sources()
+        return self._async_untrack_sources
+
+    @callback
+    def _async_track_sources(self) -> None:
+        """Track the state and registration of the source lights."""
+        self._member_capabilities = {}
+        for entity_id in self.source_entity_ids:
+            state = self.hass.states.get(entity_id)
+            if state is not None and state.state != STATE_UNAVAILABLE:
+                self._member_capabilities[entity_id] = (
+                    LightCapabilities.from_attributes(state.attributes)
+                )
+        self._async_update_capabilities()
+
+        self._unsub_track = async_track_state_change_event(
+            self.hass, self.source_entity_ids, self._async_source_changed
+        )
+
+        # Link the entities once the source light registers, if it had not yet
+        if self.device is None and len(self.source_entity_ids) == 1:
+            self._unsub_registry = self.hass.bus.async_listen(
+                er.EVENT_ENTITY_REGISTRY_UPDATED,
+                self._async_entity_registry_updated,
+                event_filter=self._async_filter_entity_registry_updated,
+            )
+
+    @callback
+    def _async_untrack_sources(self) -> None:
+        """Stop tracking the source lights."""
+        if self._unsub_track is not None:
+            self._unsub_track()
+            self._unsub_track = None
+        if self._unsub_registry is not None:
+            self._unsub_registry()
+            self._unsub_registry = None
+
+    @callback
+    def async_apply_options(self) -> bool:
+        """Apply changed options to the live entities.
+
+        Returns False if the entry has to be reloaded instead, because its
+        layers, and with that its entities, changed.
+        """
+        source_entity_ids = get_source_entity_ids(self.entry)
+        if get_layers(self.entry) != self.layers or not source_entity_ids:
+            return False
+
+        self.mirror = self.entry.options.get(CONF_MIRROR_SOURCE, False)
+        self.crossfade = self.entry.options.get(CONF_CROSSFADE, 0)
+        if source_entity_ids == self.source_entity_ids:
+            return True
+
+        _LOGGER.debug(
+            "Switching %s from source lights %s to %s",
+            self.entry.title,
+            self.source_entity_ids,
+            source_entity_ids,
+        )
+        self._async_untrack_sources()
+        self.source_entity_ids = source_entity_ids
+        data = self.hass.data[DATA_MITMILI]
+        previous = self.pipeline
+        self.pipeline = data.async_get_pipeline(source_entity_ids)
+        data.async_release_pipeline(previous)
+        self.device = self._async_resolve_device()
+        self._async_link_device()
+        self._async_track_sources()
+        self.async_notify_changed()
+
+        # The new source lights follow the active light
+        if (light := self.active_light) is not None and self.async_should_send(light):
+            light.async_sync_to_source()
+        return True
+
+    @callback
+    def _async_filter_entity_registry_updated(
+        self, event_data: er.EventEntityRegistryUpdatedData
+    ) -> bool:
+        """Return if a registry update is about the source light."""
+        return (
+            event_data["action"] != "remove"
+            and event_data["entity_id"] == self.source_entity_ids[0]
+        )
+
+    @callback
+    def _async_entity_registry_updated(
+        self, event: Event[er.EventEntityRegistryUpdatedData]
+    ) -> None:
+        """Link the entities to the device of the source light once it has one."""
+        if (device := self._async_resolve_device()) is None:
+            return
+        self.device = device
+        if self._unsub_registry is not None:
+            self._unsub_registry()
+            self._unsub_registry = None
+        self._async_link_device()
+
+    @callback
+    def _async_link_device(self) -> None:
+        """Link the registered entities of the entry to the current device."""
+        device_id = self.device.id if self.device is not None else None
+        registry = er.async_get(self.hass)
+        for entity_entry in er.async_entries_for_config_entry(
+            registry, self.entry.entry_id
+        ):
+            if entity_entry.device_id != device_id:
+                registry.async_update_entity(
+                    entity_entry.entity_id, device_id=device_id
+                )
+        _LOGGER.debug(
+            "Linked entities of %s to device %s of source lights %s",
+            self.entry.title,
+            device_id,
+            self.source_entity_ids,
+        )
+
+    @callback
+    def _async_source_changed(self, event: Event[EventStateChangedData]) -> None:
+        """Update the lights after the source light changed.
+
+        Changes not caused by us are taken over by the active light if the
+        entry mirrors its source light.
+        """
+        self.async_notify_changed()
+        new_state = event.data["new_state"]
+        if new_state is None or new_state.state == STATE_UNAVAILABLE:
+            return
+
+        old_state = event.data["old_state"]
+        entity_id = event.data["entity_id"]
+        if (
+            self.mirror
+            and self.ready
+            and old_state is not None
+            and (light := self.active_light) is not None
+            and not self.pipeline.async_is_own_change(new_state)
+        ):
+            light.async_mirror_source(new_state)
+
+        # Most state changes leave the capabilities alone, skip those cheaply
+        if (
+            entity_id in self._member_capabilities
+            and old_state is not None
+            and old_state.state != STATE_UNAVAILABLE
+            and not capabilities_changed(old_state.attributes, new_state.attributes)
+        ):
+            return
+
+        self._member_capabilities[entity_id] = LightCapabilities.from_attributes(
+            new_state.attributes
+        )
+        self._async_update_capabilities()
+
+    @callback
+    def _async_update_capabilities(self) -> None:
+        """Apply the common capabilities of the source lights if they changed."""
+        capabilities = LightCapabilities.intersection(
+            self._member_capabilities.values()
+        )
+        if capabilities is None or capabilities == self.capabilities:
+            return
+
+        _LOGGER.debug(
+            "Capabilities of source lights %s changed: %s",
+            self.source_entity_ids,
+            capabilities,
+        )
+        self.capabilities = capabilities
+        for light in self.lights:
+            if light is not None:
+                light.async_apply_capabilities(capabilities)
+                light.async_write_ha_state()
+
+    @callback
+    def _async_resolve_device(self) -> DeviceEntry | None:
+        """Return the device to link the entities to.
+
+        Entries fronting multiple source lights have no single device.
+        """
+        if len(self.source_entity_ids) != 1:
+            return None
+        return async_entity_id_to_device(self.hass, self.source_entity_ids[0])
+
+    @callback
+    def async_get_layer_suffix(self, layer: int) -> str:
+        """Return the name suffix of the light of a layer."""
+        if layer == LAYER_PROXY:
+            return SUFFIX_PROXY
+        if layer == LAYER_OVERRIDE:
+            return SUFFIX_OVERRIDE
+        return self.layers[layer - LAYER_OVERRIDE - 1]
+
+    @property
+    def active_layer(self) -> int:
+        """Return the highest enabled layer."""
+        return self._enabled.bit_length() - 1
+
+    @property
+    def active_light(self) -> ProxyLight | None:
+        """Return the light that currently controls the source light."""
+        return self.lights[self.active_layer]
+
+    @property
+    def overridden(self) -> bool:
+        """Return if the override layer is enabled."""
+        return self.is_layer_enabled(LAYER_OVERRIDE)
+
+    def is_layer_enabled(self, layer: int) -> bool:
+        """Return if a layer is enabled."""
+        return bool(self._enabled >> layer & 1)
+
+    @callback
+    def async_restore_layer(self, layer: int, enabled: bool) -> None:
+        """Restore if a layer is enabled, without syncing the source light."""
+        if enabled:
+            self._enabled |= 1 << layer
+        elif layer != LAYER_PROXY:
+            self._enabled &= ~(1 << layer)
+        self.async_notify_changed()
+
+    @callback
+    def async_register_light(self, light: ProxyLight) -> None:
+        """Register the light of a layer."""
+        self.lights[light.layer] = light
+        self.async_notify_changed()
+
+    @callback
+    def async_unregister_light(self, light: ProxyLight) -> None:
+        """Unregister the light of a layer."""
+        if self.lights[light.layer] is light:
+            self.lights[light.layer] = None
+            self.async_notify_changed()
+
+    @callback
+    def async_notify_changed(self) -> None:
+        """Tell the subscribers of all entries that this entry changed."""
+        self.hass.data[DATA_MITMILI].async_entry_changed(self.entry.entry_id)
+
+    @callback
+    def async_should_send(self, light: ProxyLight) -> bool:
+        """Return if a light may send its commands to the source light now.
+
+        Commands of the active light made before the entry is released by the
+        resync scheduler are not sent, but replayed as a single resync later.
+        """
+        if self.active_light is not light:
+            return False
+        if not self.ready:
+            self.resync_needed = True
+            return False
+        return True
+
+    @callback
+    def async_set_layer_enabled(
+        self,
+        layer: int,
+        enabled: bool,
+        priority: CommandPriority = CommandPriority.INTERACTIVE,
+    ) -> None:
+        """Enable or disable a layer and sync the light if it became active."""
+        if layer == LAYER_PROXY or self.is_layer_enabled(layer) == enabled:
+            return
+        previous = self.active_layer
+        previous_light = self.active_light
+        self.async_restore_layer(layer, enabled)
+        self.stats.switch_toggles += 1
+        if layer == LAYER_OVERRIDE and not enabled:
+            self.async_set_override_expiry(None)
+
+        if (switch := self.switches[layer]) is not None:
+            switch.async_write_ha_state()
+
+        if self.active_layer == previous:
+            return
+        if (light := self.active_light) is not None and self.async_should_send(light):
+            _LOGGER.info(
+                "Light %s became active, syncing state to source lights %s",
+                light.name,
+                self.source_entity_ids,
+            )
+            light.async_sync_to_source(
+                priority,
+                previous_light.light_state if previous_light is not None else None,
+            )
+
+    @callback
+    def async_set_overridden(
+        self,
+        overridden: bool,
+        priority: CommandPriority = CommandPriority.INTERACTIVE,
+        until: datetime | None = None,
+    ) -> None:
+        """Set the overridden flag and sync the light that became active.
+
+        An override set with an end time is reverted at that time, an override
+        set without one lasts until it is turned off.
+        """
+        if overridden and until != self.override_expires:
+            self.async_set_override_expiry(until)
+            if self.overridden and (switch := self.switches[LAYER_OVERRIDE]):
+                switch.async_write_ha_state()
+        self.async_set_layer_enabled(LAYER_OVERRIDE, overridden, priority)
+
+    @callback
+    def async_set_override_expiry(self, expires: datetime | None) -> None:
+        """Set when the override layer is disabled again, None for never."""
+        self.override_expires = expires
+        self.async_notify_changed()
+        expiry = self.hass.data[DATA_MITMILI].expiry
+        if expires is None:
+            expiry.async_cancel(self)
+        else:
+            expiry.async_schedule(self, expires)
+
+    @callback
+    def async_source_differs(self, light: ProxyLight) -> bool:
+        """Return if any available source light differs from a light's state."""
+        light_state = light.light_state
+        if light_state.is_on:
+            service, data = SERVICE_TURN_ON, light_state.as_service_data()
+        else:
+            service, data = SERVICE_TURN_OFF, {}
+        for entity_id in self.source_entity_ids:
+            state = self.hass.states.get(entity_id)
+            if state is None or state.state == STATE_UNAVAILABLE:
+                continue
+            if diff_against_state(service, data, state) is not None:
+                return True
+        return False
+
+    @callback
+    def async_resync_needed(self) -> bool:
+        """Return if releasing the entry sends a sync to the source lights.
+
+        That is the case if commands were held back, or if the restored state
+        of the active light differs from the source lights.
+        """
+        if self.resync_needed:
+            return True
+        if (light := self.active_light) is None or not light.state_restored:
+            return False
+        if self.async_source_differs(light):
+            _LOGGER.debug(
+                "Source lights %s differ from restored state of %s",
+                self.source_entity_ids,
+                light.name,
+            )
+            self.resync_needed = True
+        return self.resync_needed
+
+    async def async_resync(self) -> None:
+        """Release the entry and replay held back commands as a single sync.
+
+        A restored state is only synced if the source light is not already in it.
+        """
+        self.ready = True
+        if (light := self.active_light) is None or not self.async_resync_needed():
+            return
+        self.resync_needed = False
+        light.async_sync_to_source()
+        await self.pipeline.async_wait_idle()
+
+
+MitmiliConfigEntry = ConfigEntry[MitmiliCoordinator]
+
+
+def get_layers(entry: ConfigEntry) -> tuple[str, ...]:
+    """Return the names of the additional layers of a config entry, lowest first.
+
+    The unique IDs of the entities of a layer are derived from its slug, of
+    names with the same slug only the first is used.
+    """
+    layers: dict[str, str] = {}
+    for name in entry.options.get(CONF_LAYERS) or ():
+        if name := name.strip():
+            layers.setdefault(slugify(name), name)
+    return tuple(layers.values())
+
+
+def get_source_entity_ids(entry: ConfigEntry) -> tuple[str, ...]:
+    """Return the source lights of a config entry.
+
+    Entries created before multiple source lights were supported hold a
+    single entity ID instead of a list.
+    """
+    source = entry.options.get(CONF_SOURCE_ENTITY_ID) or entry.data.get(
+        CONF_SOURCE_ENTITY_ID
+    )
+    if not source:
+        return ()
+    if isinstance(source, str):
+        return (source,)
+    return tuple(source)
@@ -0,0 +1,74 @@
+"""Diagnostics support for the Man in the Middle Light integration."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+
+from .const import DATA_MITMILI
+from .coordinator import MitmiliConfigEntry
+from .stats import SourceStats
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: MitmiliConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator = entry.runtime_data
+    data = hass.data[DATA_MITMILI]
+
+    # Totals of all source lights, including those of other entries
+    totals = SourceStats()
+    for pipeline in data.pipelines.values():
+        totals.merge(pipeline.stats)
+
+    return {
+        "entry": {
+            "title": entry.title,
+            "options": dict(entry.options),
+        },
+        "overridden": coordinator.overridden,
+        "override_expires": (
+            coordinator.override_expires.isoformat()
+            if coordinator.override_expires
+            else None
+        ),
+        "layers": list(coordinator.layers),
+        "active_layer": coordinator.active_layer,
+        "ready": coordinator.ready,
+        "setup_duration": coordinator.setup_duration,
+        "device_linked": coordinator.device is not None,
+        "commands": coordinator.stats.as_dict(),
+        "source": {
+            "entity_ids": list(coordinator.source_entity_ids),
+            "calls": coordinator.pipeline.stats.as_dict(),
+        },
+        "integration": {
+            "source_lights": len(data.pipelines),
+            "calls": totals.as_dict(),
+            "calls_merged_into_multi_entity_calls": data.batcher.merged,
+            "calls_dropped_by_scheduler": data.scheduler.dropped,
+            "calls_sharing_a_rate_limit_token": data.scheduler.batched,
+            "last_resync_duration": data.resync.last_duration,
+            "last_resync_entries": data.resync.last_count,
+            "tracing": data.tracer is not None,
+            "reconcile": (
+                {
+                    "rounds": data.reconciler.rounds,
+                    "checked": data.reconciler.checked,
+                    "drifted": data.reconciler.drifted,
+                    "corrected": data.reconciler.corrected,
+                    "drift_rate": data.reconciler.drift_rate,
+                    "last_round_drifted": data.reconciler.last_round_drifted,
+                }
+                if data.reconciler is not None
+                else None
+            ),
+            "timed_overrides": len(data.expiry),
+            "timed_overrides_expired": data.expiry.expired,
+            "entries_set_up": data.setup_count,
+            "total_setup_duration": data.setup_duration,
+            "max_setup_duration": data.setup_duration_max,
+        },
+    }
@@ -0,0 +1,108 @@
+"""Shared expiry of timed overrides for Man in the Middle Light."""
+
+from __future__ import annotations
+
+from datetime import datetime
+import heapq
+import logging
+from typing import TYPE_CHECKING
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_point_in_utc_time
+from homeassistant.util import dt as dt_util
+
+from .scheduler import CommandPriority
+
+if TYPE_CHECKING:
+    from .coordinator import MitmiliCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class OverrideExpiryScheduler:
+    """Revert timed overrides of all entries using a single timer.
+
+    Expiry times are kept in a heap, and only the earliest one has a timer.
+    Rescheduling or cancelling an override leaves its old heap item behind,
+    which is skipped once it reaches the top. All overrides that are due when
+    the timer fires are reverted in the same event loop iteration, so their
+    commands are batched together. Entries cancel their override when they
+    are unloaded, and schedule it again when their switch is restored.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the scheduler."""
+        self.hass = hass
+        self._expiries: dict[str, tuple[datetime, MitmiliCoordinator]] = {}
+        self._heap: list[tuple[datetime, str]] = []
+        self._unsub_timer: CALLBACK_TYPE | None = None
+        self._timer_at: datetime | None = None
+        self.expired = 0
+
+    def __len__(self) -> int:
+        """Return the number of scheduled overrides."""
+        return len(self._expiries)
+
+    def _is_live(self, when: datetime, entry_id: str) -> bool:
+        """Return if a heap item is the current expiry of its entry."""
+        expiry = self._expiries.get(entry_id)
+        return expiry is not None and expiry[0] == when
+
+    @callback
+    def async_schedule(self, coordinator: MitmiliCoordinator, when: datetime) -> None:
+        """Revert the override of an entry at a point in time."""
+        when = dt_util.as_utc(when)
+        entry_id = coordinator.entry.entry_id
+        self._expiries[entry_id] = (when, coordinator)
+        heapq.heappush(self._heap, (when, entry_id))
+        if self._timer_at is None or when < self._timer_at:
+            self._async_start_timer(when)
+
+    @callback
+    def async_cancel(self, coordinator: MitmiliCoordinator) -> None:
+        """Stop reverting the override of an entry."""
+        self._expiries.pop(coordinator.entry.entry_id, None)
+
+    @callback
+    def _async_start_timer(self, when: datetime) -> None:
+        """Run the timer for the earliest expiry."""
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+        self._timer_at = when
+        self._unsub_timer = async_track_point_in_utc_time(
+            self.hass, self._async_expire, when
+        )
+
+    @callback
+    def _async_expire(self, now: datetime) -> None:
+        """Revert all overrides that are due."""
+        self._unsub_timer = None
+        self._timer_at = None
+
+        due: list[MitmiliCoordinator] = []
+        while self._heap and self._heap[0][0] <= now:
+            when, entry_id = heapq.heappop(self._heap)
+            # Skip items of overrides that were rescheduled or cancelled
+            if self._is_live(when, entry_id):
+                due.append(self._expiries.pop(entry_id)[1])
+
+        # Drop stale items at the top, so the timer is set for a live one
+        while self._heap and not self._is_live(*self._heap[0]):
+            heapq.heappop(self._heap)
+        if self._heap:
+            self._async_start_timer(self._heap[0][0])
+
+        if not due:
+            return
+        _LOGGER.debug("Reverting %d timed overrides", len(due))
+        self.expired += len(due)
+        for coordinator in due:
+            coordinator.async_set_overridden(False, CommandPriority.BULK)
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Stop the timer, the expiry times are restored with the switches."""
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._unsub_timer = None
+        self._timer_at = None
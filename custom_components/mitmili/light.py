@@ -3,202 +3,294 @@
 from __future__ import annotations
 
 import logging
+import math
 from typing import Any
 
 from homeassistant.components.light import (
-    ATTR_BRIGHTNESS,
     ATTR_COLOR_TEMP_KELVIN,
-    ATTR_EFFECT,
     ATTR_HS_COLOR,
     ATTR_RGB_COLOR,
     ATTR_RGBW_COLOR,
     ATTR_RGBWW_COLOR,
     ATTR_TRANSITION,
-    ATTR_WHITE,
     ATTR_XY_COLOR,
     ColorMode,
     LightEntity,
     LightEntityFeature,
+    brightness_supported,
 )
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import Event, HomeAssistant, callback
-from homeassistant.helpers import entity_registry as er
-from homeassistant.helpers.device import async_entity_id_to_device
+from homeassistant.const import SERVICE_TURN_OFF, SERVICE_TURN_ON
+from homeassistant.core import HomeAssistant, State, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.event import async_track_state_change_event
-from homeassistant.helpers.restore_state import RestoreEntity
+from homeassistant.helpers.restore_state import (
+    ExtraStoredData,
+    RestoredExtraData,
+    RestoreEntity,
+)
+from homeassistant.util import dt as dt_util, slugify
 
-from .const import CONF_SOURCE_ENTITY_ID, DOMAIN, SUFFIX_OVERRIDE, SUFFIX_OVERRIDDEN, SUFFIX_PROXY
+from .const import (
+    ATTR_SOURCE_CALLS_SENT,
+    ATTR_SOURCE_CALLS_SKIPPED,
+    DATA_MITMILI,
+    LAYER_OVERRIDE,
+)
+from .capabilities import LightCapabilities
+from .coordinator import MitmiliConfigEntry
+from .light_state import TURN_ON_ATTRS, LightState
+from .scheduler import CommandPriority
 
 _LOGGER = logging.getLogger(__name__)
 
 
 async def async_setup_entry(
     hass: HomeAssistant,
-    entry: ConfigEntry,
+    entry: MitmiliConfigEntry,
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up Man in the Middle Light entities."""
-    source_entity_id = entry.options.get(CONF_SOURCE_ENTITY_ID) or entry.data.get(
-        CONF_SOURCE_ENTITY_ID
+    # Create a light for every layer, starting with the proxy and override lights
+    async_add_entities(
+        ProxyLight(hass, entry, layer)
+        for layer in range(len(entry.runtime_data.lights))
     )
 
-    # Create proxy and override light entities
-    proxy_light = ProxyLight(hass, entry, source_entity_id, is_override=False)
-    override_light = ProxyLight(hass, entry, source_entity_id, is_override=True)
-
-    async_add_entities([proxy_light, override_light])
-
 
 class ProxyLight(RestoreEntity, LightEntity):
     """Representation of a Proxy Light."""
 
     _attr_should_poll = False
+    _unrecorded_attributes = frozenset(
+        {ATTR_SOURCE_CALLS_SENT, ATTR_SOURCE_CALLS_SKIPPED}
+    )
 
     def __init__(
         self,
         hass: HomeAssistant,
-        entry: ConfigEntry,
-        source_entity_id: str,
-        is_override: bool,
+        entry: MitmiliConfigEntry,
+        layer: int,
     ) -> None:
         """Initialize the proxy light."""
         self.hass = hass
         self._entry = entry
-        self._source_entity_id = source_entity_id
-        self._is_override = is_override
+        self._coordinator = entry.runtime_data
+        self.layer = layer
 
-        # Generate unique_id based on config entry and type
-        suffix = SUFFIX_OVERRIDE if is_override else SUFFIX_PROXY
-        self._attr_unique_id = f"{entry.entry_id}_{suffix}"
+        # Generate unique_id based on config entry and layer
+        suffix = self._coordinator.async_get_layer_suffix(layer)
+        if layer > LAYER_OVERRIDE:
+            self._attr_unique_id = f"{entry.entry_id}_layer_{slugify(suffix)}"
+        else:
+            self._attr_unique_id = f"{entry.entry_id}_{suffix}"
         self._attr_name = f"{entry.title} {suffix}"
 
         # Link this entity to the source entity's device
-        self.device_entry = async_entity_id_to_device(hass, source_entity_id)
+        self.device_entry = self._coordinator.device
 
-        # Initialize state attributes
-        self._attr_is_on = False
-        self._attr_brightness: int | None = None
-        self._attr_color_mode: ColorMode | None = None
+        # The light state is kept as one snapshot, the capabilities are copied
+        # from the source light
+        self._state = LightState()
+        self.state_restored = False
         # Set default color mode, will be updated from source light
         self._attr_supported_color_modes: set[ColorMode] = {ColorMode.ONOFF}
         self._attr_supported_features: LightEntityFeature = LightEntityFeature(0)
-        self._attr_hs_color: tuple[float, float] | None = None
-        self._attr_rgb_color: tuple[int, int, int] | None = None
-        self._attr_rgbw_color: tuple[int, int, int, int] | None = None
-        self._attr_rgbww_color: tuple[int, int, int, int, int] | None = None
-        self._attr_xy_color: tuple[float, float] | None = None
-        self._attr_color_temp_kelvin: int | None = None
         self._attr_min_color_temp_kelvin: int | None = None
         self._attr_max_color_temp_kelvin: int | None = None
         self._attr_effect_list: list[str] | None = None
-        self._attr_effect: str | None = None
-        self._attr_white: int | None = None
-
-    def _get_overridden_switch_entity_id(self) -> str | None:
-        """Get the entity ID of the overridden switch by looking up its unique_id."""
-        ent_reg = er.async_get(self.hass)
-        unique_id = f"{self._entry.entry_id}_{SUFFIX_OVERRIDDEN}"
-
-        # Find the switch entity by unique_id
-        for entity_id, entry in ent_reg.entities.items():
-            if entry.unique_id == unique_id:
-                _LOGGER.debug(
-                    "Found overridden switch entity: %s for light %s",
-                    entity_id,
-                    self._attr_name,
-                )
-                return entity_id
 
-        _LOGGER.warning(
-            "Could not find overridden switch entity with unique_id %s for light %s",
-            unique_id,
-            self._attr_name,
-        )
-        return None
+    @property
+    def light_state(self) -> LightState:
+        """Return the state snapshot of the light."""
+        return self._state
+
+    @property
+    def extra_restore_state_data(self) -> ExtraStoredData:
+        """Return the state snapshot to restore after a restart."""
+        return RestoredExtraData(self._state.as_dict())
+
+    @property
+    def is_on(self) -> bool:
+        """Return if the light is on."""
+        return self._state.is_on
+
+    @property
+    def brightness(self) -> int | None:
+        """Return the brightness of the light."""
+        return self._state.brightness
+
+    @property
+    def color_mode(self) -> ColorMode | None:
+        """Return the color mode of the light."""
+        return self._state.color_mode
+
+    @property
+    def hs_color(self) -> tuple[float, float] | None:
+        """Return the hue and saturation of the light."""
+        return self._state.color_value(ATTR_HS_COLOR)
+
+    @property
+    def rgb_color(self) -> tuple[int, int, int] | None:
+        """Return the RGB color of the light."""
+        return self._state.color_value(ATTR_RGB_COLOR)
+
+    @property
+    def rgbw_color(self) -> tuple[int, int, int, int] | None:
+        """Return the RGBW color of the light."""
+        return self._state.color_value(ATTR_RGBW_COLOR)
+
+    @property
+    def rgbww_color(self) -> tuple[int, int, int, int, int] | None:
+        """Return the RGBWW color of the light."""
+        return self._state.color_value(ATTR_RGBWW_COLOR)
+
+    @property
+    def xy_color(self) -> tuple[float, float] | None:
+        """Return the XY color of the light."""
+        return self._state.color_value(ATTR_XY_COLOR)
+
+    @property
+    def color_temp_kelvin(self) -> int | None:
+        """Return the color temperature of the light."""
+        return self._state.color_value(ATTR_COLOR_TEMP_KELVIN)
+
+    @property
+    def effect(self) -> str | None:
+        """Return the current effect of the light."""
+        return self._state.effect
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the number of calls sent to and skipped for the source light."""
+        return {
+            ATTR_SOURCE_CALLS_SENT: self._coordinator.pipeline.stats.sent,
+            ATTR_SOURCE_CALLS_SKIPPED: self._coordinator.pipeline.stats.skipped,
+        }
 
-    def _sync_to_source(self) -> None:
-        """Sync this proxy's state to the source light."""
-        # Prepare service data
-        service_data: dict[str, Any] = {"entity_id": self._source_entity_id}
+    @callback
+    def async_write_ha_state(self) -> None:
+        """Write the state, and tell the subscribers of the entry."""
+        super().async_write_ha_state()
+        self._coordinator.async_notify_changed()
 
-        if self._attr_is_on:
+    @callback
+    def async_sync_to_source(
+        self,
+        priority: CommandPriority = CommandPriority.BULK,
+        fade_from: LightState | None = None,
+    ) -> None:
+        """Sync this proxy's state to the source light.
+
+        With the state of the light that was active before, the source light
+        cross-fades from that state if the entry has a cross-fade duration.
+        """
+        stats = self._coordinator.stats
+        stats.syncs += 1
+        stats.last_sync = dt_util.utcnow()
+
+        if (
+            fade_from is not None
+            and self._coordinator.crossfade
+            and self._async_crossfade(fade_from, priority)
+        ):
+            return
+
+        if self._state.is_on:
             # Turn on with current attributes
-            if self._attr_brightness is not None:
-                service_data[ATTR_BRIGHTNESS] = self._attr_brightness
-            if self._attr_hs_color is not None:
-                service_data[ATTR_HS_COLOR] = self._attr_hs_color
-            if self._attr_rgb_color is not None:
-                service_data[ATTR_RGB_COLOR] = self._attr_rgb_color
-            if self._attr_rgbw_color is not None:
-                service_data[ATTR_RGBW_COLOR] = self._attr_rgbw_color
-            if self._attr_rgbww_color is not None:
-                service_data[ATTR_RGBWW_COLOR] = self._attr_rgbww_color
-            if self._attr_xy_color is not None:
-                service_data[ATTR_XY_COLOR] = self._attr_xy_color
-            if self._attr_color_temp_kelvin is not None:
-                service_data[ATTR_COLOR_TEMP_KELVIN] = self._attr_color_temp_kelvin
-            if self._attr_effect is not None:
-                service_data[ATTR_EFFECT] = self._attr_effect
-            if self._attr_white is not None:
-                service_data[ATTR_WHITE] = self._attr_white
-
-            self.hass.async_create_task(
-                self.hass.services.async_call("light", "turn_on", service_data)
+            self._coordinator.pipeline.async_submit(
+                SERVICE_TURN_ON,
+                self._state.as_service_data(),
+                replace=True,
+                priority=priority,
             )
         else:
             # Turn off
-            self.hass.async_create_task(
-                self.hass.services.async_call("light", "turn_off", service_data)
+            self._coordinator.pipeline.async_submit(
+                SERVICE_TURN_OFF, {}, replace=True, priority=priority
             )
 
-    def _copy_source_capabilities(self) -> None:
-        """Copy capabilities from the source light."""
-        source_state = self.hass.states.get(self._source_entity_id)
-        if not source_state:
-            _LOGGER.warning(
-                "Could not get source light %s state to copy capabilities",
-                self._source_entity_id,
+    @callback
+    def _async_crossfade(self, start: LightState, priority: CommandPriority) -> bool:
+        """Fade the source light from a state to that of this light.
+
+        Source lights that support transitions fade by themselves. For others
+        the pipeline sends the brightness and color in between as frames, as
+        many as the frame rate allows. Returns False if there is nothing to
+        fade, and the state is synced as usual.
+        """
+        end = self._state
+        if start == end or not (start.is_on or end.is_on):
+            return False
+        coordinator = self._coordinator
+        duration = coordinator.crossfade
+        pipeline = coordinator.pipeline
+
+        if self._attr_supported_features & LightEntityFeature.TRANSITION:
+            if end.is_on:
+                pipeline.async_submit(
+                    SERVICE_TURN_ON,
+                    {**end.as_service_data(), ATTR_TRANSITION: duration},
+                    replace=True,
+                    priority=priority,
+                )
+            else:
+                pipeline.async_submit(
+                    SERVICE_TURN_OFF,
+                    {ATTR_TRANSITION: duration},
+                    replace=True,
+                    priority=priority,
+                )
+            return True
+
+        if not brightness_supported(self._attr_supported_color_modes):
+            return False
+        count = max(
+            1, math.ceil(duration * self.hass.data[DATA_MITMILI].fade_frame_rate)
+        )
+        frames: list[tuple[str, dict[str, Any]]] = []
+        for index in range(1, count + 1):
+            state = start.interpolate(end, index / count)
+            frames.append(
+                (SERVICE_TURN_ON, state.as_service_data())
+                if state.is_on
+                else (SERVICE_TURN_OFF, {})
             )
+        _LOGGER.debug(
+            "Light %s fading source lights in %d frames", self._attr_name, count
+        )
+        pipeline.async_fade(frames, duration / count, priority)
+        return True
+
+    @callback
+    def async_mirror_source(self, state: State) -> None:
+        """Take over a change of the source light made outside of this light."""
+        new_state = self._state.mirror(state)
+        if new_state == self._state:
             return
+        _LOGGER.debug("Light %s mirrored source state %s", self._attr_name, new_state)
+        self._state = new_state
+        self._coordinator.stats.mirrored += 1
+        self.async_write_ha_state()
 
-        # Copy supported color modes
-        supported_color_modes = source_state.attributes.get("supported_color_modes")
-        if supported_color_modes:
-            self._attr_supported_color_modes = set(
-                ColorMode(mode) for mode in supported_color_modes
-            )
-            _LOGGER.debug(
-                "Light %s copied color modes: %s",
-                self._attr_name,
-                self._attr_supported_color_modes,
-            )
+    @callback
+    def async_apply_capabilities(self, capabilities: LightCapabilities) -> None:
+        """Apply the capabilities of the source light."""
+        self._attr_supported_color_modes = set(capabilities.supported_color_modes)
+        self._attr_supported_features = capabilities.supported_features
+        self._attr_min_color_temp_kelvin = capabilities.min_color_temp_kelvin
+        self._attr_max_color_temp_kelvin = capabilities.max_color_temp_kelvin
+        self._attr_effect_list = (
+            list(capabilities.effect_list) if capabilities.effect_list else None
+        )
 
-        # Copy current color mode
-        color_mode = source_state.attributes.get("color_mode")
-        if color_mode:
-            self._attr_color_mode = ColorMode(color_mode)
-        elif self._attr_supported_color_modes:
-            # If no color mode set, use the first supported mode
-            self._attr_color_mode = next(iter(self._attr_supported_color_modes))
-
-        # Copy supported features
-        supported_features = source_state.attributes.get("supported_features", 0)
-        self._attr_supported_features = LightEntityFeature(supported_features)
-
-        # Copy color temperature range if supported
-        if ColorMode.COLOR_TEMP in (self._attr_supported_color_modes or set()):
-            self._attr_min_color_temp_kelvin = source_state.attributes.get(
-                "min_color_temp_kelvin"
-            )
-            self._attr_max_color_temp_kelvin = source_state.attributes.get(
-                "max_color_temp_kelvin"
+        # If no (longer a) supported color mode set, use the first supported mode
+        if self._state.color_mode not in self._attr_supported_color_modes:
+            self._state = self._state.with_color_mode(
+                next(iter(self._attr_supported_color_modes))
             )
 
-        # Copy effect list if supported
-        effect_list = source_state.attributes.get("effect_list")
-        if effect_list:
-            self._attr_effect_list = effect_list
+        _LOGGER.debug(
+            "Light %s applied capabilities: %s", self._attr_name, capabilities
+        )
 
     async def async_added_to_hass(self) -> None:
         """Handle entity added to hass."""
@@ -250,183 +342,56 @@ class ProxyLight(RestoreEntity, LightEntity):
             if effect_list:
                 self._attr_effect_list = effect_list
 
-        # If no saved state or capabilities weren't restored, copy from source
-        if not capabilities_restored:
-            _LOGGER.debug(
-                "Light %s: no saved capabilities, copying from source light %s",
-                self._attr_name,
-                self._source_entity_id,
-            )
-            self._copy_source_capabilities()
-
-        # Track override switch for state changes
-        switch_entity_id = self._get_overridden_switch_entity_id()
-        if switch_entity_id:
-            _LOGGER.debug(
-                "Light %s tracking switch %s for state changes",
-                self._attr_name,
-                switch_entity_id,
-            )
-            self.async_on_remove(
-                async_track_state_change_event(
-                    self.hass, [switch_entity_id], self._handle_overridden_change
-                )
-            )
-        else:
-            _LOGGER.error(
-                "Light %s could not find switch entity to track", self._attr_name
+        # Restore the complete state, including the attributes that are not
+        # part of the state of a light that is off
+        if (extra_data := await self.async_get_last_extra_data()) is not None and (
+            state := LightState.from_dict(extra_data.as_dict())
+        ) is not None:
+            self._state = state
+            self.state_restored = True
+            _LOGGER.debug("Light %s: restored state %s", self._attr_name, state)
+
+        # The live capabilities of the source light take precedence
+        if (capabilities := self._coordinator.capabilities) is not None:
+            self.async_apply_capabilities(capabilities)
+        elif not capabilities_restored:
+            _LOGGER.warning(
+                "Could not get source lights %s state to copy capabilities",
+                self._coordinator.source_entity_ids,
             )
 
-    @callback
-    def _handle_overridden_change(self, event: Event) -> None:
-        """Handle changes to the overridden boolean."""
-        # When the overridden state changes, sync the active proxy to the source
-        new_state = event.data.get("new_state")
-        if new_state is None:
-            return
-
-        is_overridden = new_state.state == "on"
-
-        _LOGGER.debug(
-            "Light %s received switch change event, is_overridden=%s, this is override=%s",
-            self._attr_name,
-            is_overridden,
-            self._is_override,
+        self._coordinator.async_register_light(self)
+        self.async_on_remove(
+            lambda: self._coordinator.async_unregister_light(self)
         )
 
-        # If this proxy just became active, sync to source
-        if (self._is_override and is_overridden) or (
-            not self._is_override and not is_overridden
-        ):
-            _LOGGER.info(
-                "Light %s became active, syncing state to source light %s",
-                self._attr_name,
-                self._source_entity_id,
-            )
-            self._sync_to_source()
-
     async def async_turn_on(self, **kwargs: Any) -> None:
         """Turn on the light."""
-        # Update internal state
-        self._attr_is_on = True
-
-        if ATTR_BRIGHTNESS in kwargs:
-            self._attr_brightness = kwargs[ATTR_BRIGHTNESS]
-
-        # Color attributes are mutually exclusive - clear others when one is set
-        # Also update color_mode to match the attribute being set
-        if ATTR_HS_COLOR in kwargs:
-            self._attr_hs_color = kwargs[ATTR_HS_COLOR]
-            self._attr_rgb_color = None
-            self._attr_rgbw_color = None
-            self._attr_rgbww_color = None
-            self._attr_xy_color = None
-            self._attr_color_temp_kelvin = None
-            self._attr_color_mode = ColorMode.HS
-        elif ATTR_RGB_COLOR in kwargs:
-            self._attr_rgb_color = kwargs[ATTR_RGB_COLOR]
-            self._attr_hs_color = None
-            self._attr_rgbw_color = None
-            self._attr_rgbww_color = None
-            self._attr_xy_color = None
-            self._attr_color_temp_kelvin = None
-            self._attr_color_mode = ColorMode.RGB
-        elif ATTR_RGBW_COLOR in kwargs:
-            self._attr_rgbw_color = kwargs[ATTR_RGBW_COLOR]
-            self._attr_hs_color = None
-            self._attr_rgb_color = None
-            self._attr_rgbww_color = None
-            self._attr_xy_color = None
-            self._attr_color_temp_kelvin = None
-            self._attr_color_mode = ColorMode.RGBW
-        elif ATTR_RGBWW_COLOR in kwargs:
-            self._attr_rgbww_color = kwargs[ATTR_RGBWW_COLOR]
-            self._attr_hs_color = None
-            self._attr_rgb_color = None
-            self._attr_rgbw_color = None
-            self._attr_xy_color = None
-            self._attr_color_temp_kelvin = None
-            self._attr_color_mode = ColorMode.RGBWW
-        elif ATTR_XY_COLOR in kwargs:
-            self._attr_xy_color = kwargs[ATTR_XY_COLOR]
-            self._attr_hs_color = None
-            self._attr_rgb_color = None
-            self._attr_rgbw_color = None
-            self._attr_rgbww_color = None
-            self._attr_color_temp_kelvin = None
-            self._attr_color_mode = ColorMode.XY
-        elif ATTR_COLOR_TEMP_KELVIN in kwargs:
-            self._attr_color_temp_kelvin = kwargs[ATTR_COLOR_TEMP_KELVIN]
-            self._attr_hs_color = None
-            self._attr_rgb_color = None
-            self._attr_rgbw_color = None
-            self._attr_rgbww_color = None
-            self._attr_xy_color = None
-            self._attr_color_mode = ColorMode.COLOR_TEMP
-        elif ATTR_BRIGHTNESS in kwargs and self._attr_color_mode is None:
-            # If only brightness is set and no color mode, use brightness mode
-            self._attr_color_mode = ColorMode.BRIGHTNESS
-        elif self._attr_color_mode is None:
-            # If nothing specific is set, default to ONOFF
-            self._attr_color_mode = ColorMode.ONOFF
-
-        if ATTR_EFFECT in kwargs:
-            self._attr_effect = kwargs[ATTR_EFFECT]
-        if ATTR_WHITE in kwargs:
-            self._attr_white = kwargs[ATTR_WHITE]
+        self._coordinator.stats.turn_on += 1
 
+        # Color attributes are mutually exclusive, the snapshot keeps the one
+        # set last and updates the color mode to match it
+        self._state = self._state.turn_on(kwargs)
         self.async_write_ha_state()
 
         # Sync to source if this is the active proxy
-        switch_entity_id = self._get_overridden_switch_entity_id()
-        if switch_entity_id:
-            overridden_state = self.hass.states.get(switch_entity_id)
-            if overridden_state:
-                is_overridden = overridden_state.state == "on"
-
-                if (self._is_override and is_overridden) or (not self._is_override and not is_overridden):
-                    # Prepare service data for source light
-                    service_data: dict[str, Any] = {"entity_id": self._source_entity_id}
-
-                    if ATTR_BRIGHTNESS in kwargs:
-                        service_data[ATTR_BRIGHTNESS] = kwargs[ATTR_BRIGHTNESS]
-                    if ATTR_HS_COLOR in kwargs:
-                        service_data[ATTR_HS_COLOR] = kwargs[ATTR_HS_COLOR]
-                    if ATTR_RGB_COLOR in kwargs:
-                        service_data[ATTR_RGB_COLOR] = kwargs[ATTR_RGB_COLOR]
-                    if ATTR_RGBW_COLOR in kwargs:
-                        service_data[ATTR_RGBW_COLOR] = kwargs[ATTR_RGBW_COLOR]
-                    if ATTR_RGBWW_COLOR in kwargs:
-                        service_data[ATTR_RGBWW_COLOR] = kwargs[ATTR_RGBWW_COLOR]
-                    if ATTR_XY_COLOR in kwargs:
-                        service_data[ATTR_XY_COLOR] = kwargs[ATTR_XY_COLOR]
-                    if ATTR_COLOR_TEMP_KELVIN in kwargs:
-                        service_data[ATTR_COLOR_TEMP_KELVIN] = kwargs[ATTR_COLOR_TEMP_KELVIN]
-                    if ATTR_EFFECT in kwargs:
-                        service_data[ATTR_EFFECT] = kwargs[ATTR_EFFECT]
-                    if ATTR_WHITE in kwargs:
-                        service_data[ATTR_WHITE] = kwargs[ATTR_WHITE]
-                    if ATTR_TRANSITION in kwargs:
-                        service_data[ATTR_TRANSITION] = kwargs[ATTR_TRANSITION]
-
-                    await self.hass.services.async_call("light", "turn_on", service_data)
+        if self._coordinator.async_should_send(self):
+            service_data = {
+                attr: kwargs[attr] for attr in TURN_ON_ATTRS if attr in kwargs
+            }
+            self._coordinator.pipeline.async_submit(SERVICE_TURN_ON, service_data)
 
     async def async_turn_off(self, **kwargs: Any) -> None:
         """Turn off the light."""
-        self._attr_is_on = False
+        self._coordinator.stats.turn_off += 1
+        self._state = self._state.turn_off()
         self.async_write_ha_state()
 
         # Sync to source if this is the active proxy
-        switch_entity_id = self._get_overridden_switch_entity_id()
-        if switch_entity_id:
-            overridden_state = self.hass.states.get(switch_entity_id)
-            if overridden_state:
-                is_overridden = overridden_state.state == "on"
-
-                if (self._is_override and is_overridden) or (not self._is_override and not is_overridden):
-                    service_data: dict[str, Any] = {"entity_id": self._source_entity_id}
+        if self._coordinator.async_should_send(self):
+            service_data: dict[str, Any] = {}
 
-                    if ATTR_TRANSITION in kwargs:
-                        service_data[ATTR_TRANSITION] = kwargs[ATTR_TRANSITION]
+            if ATTR_TRANSITION in kwargs:
+                service_data[ATTR_TRANSITION] = kwargs[ATTR_TRANSITION]
 
-                    await self.hass.services.async_call("light", "turn_off", service_data)
\ No newline at end of file
+            self._coordinator.pipeline.async_submit(SERVICE_TURN_OFF, service_data)
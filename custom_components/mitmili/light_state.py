@@ -0,0 +1,213 @@
+"""Light state snapshots for the Man in the Middle Light integration."""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import asdict, dataclass, replace
+from typing import Any
+
+from homeassistant.components.light import (
+    ATTR_BRIGHTNESS,
+    ATTR_COLOR_MODE,
+    ATTR_COLOR_TEMP_KELVIN,
+    ATTR_EFFECT,
+    ATTR_HS_COLOR,
+    ATTR_RGB_COLOR,
+    ATTR_RGBW_COLOR,
+    ATTR_RGBWW_COLOR,
+    ATTR_TRANSITION,
+    ATTR_WHITE,
+    ATTR_XY_COLOR,
+    ColorMode,
+)
+from homeassistant.const import STATE_OFF, STATE_ON
+from homeassistant.core import State
+
+# The color attribute that sets each color mode, in order of precedence when
+# a command holds more than one
+COLOR_ATTR_MODES: dict[str, ColorMode] = {
+    ATTR_HS_COLOR: ColorMode.HS,
+    ATTR_RGB_COLOR: ColorMode.RGB,
+    ATTR_RGBW_COLOR: ColorMode.RGBW,
+    ATTR_RGBWW_COLOR: ColorMode.RGBWW,
+    ATTR_XY_COLOR: ColorMode.XY,
+    ATTR_COLOR_TEMP_KELVIN: ColorMode.COLOR_TEMP,
+}
+COLOR_MODE_ATTRS: dict[ColorMode, str] = {
+    mode: attr for attr, mode in COLOR_ATTR_MODES.items()
+}
+
+# Color attributes are mutually exclusive, setting one replaces the others
+COLOR_ATTRS = frozenset(COLOR_ATTR_MODES)
+
+# Attributes of a turn_on command that are passed on to the source light
+TURN_ON_ATTRS = (
+    ATTR_BRIGHTNESS,
+    *COLOR_ATTR_MODES,
+    ATTR_EFFECT,
+    ATTR_WHITE,
+    ATTR_TRANSITION,
+)
+
+
+@dataclass(frozen=True, slots=True)
+class LightState:
+    """The state of a proxy light.
+
+    Only the color of the current color mode is kept, since setting one color
+    attribute clears the others.
+    """
+
+    is_on: bool = False
+    brightness: int | None = None
+    color_mode: ColorMode | None = None
+    color: Any = None
+    effect: str | None = None
+    white: int | None = None
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> LightState | None:
+        """Return the state stored by as_dict, None if it is not valid."""
+        try:
+            color_mode = data.get("color_mode")
+            color = data.get("color")
+            return cls(
+                is_on=bool(data["is_on"]),
+                brightness=data.get("brightness"),
+                color_mode=ColorMode(color_mode) if color_mode else None,
+                color=tuple(color) if isinstance(color, list) else color,
+                effect=data.get("effect"),
+                white=data.get("white"),
+            )
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state as a JSON serializable dict."""
+        return asdict(self)
+
+    def color_value(self, attr: str) -> Any:
+        """Return the value of a color attribute, None if not in its mode."""
+        if self.color_mode == COLOR_ATTR_MODES[attr]:
+            return self.color
+        return None
+
+    def turn_on(self, data: Mapping[str, Any]) -> LightState:
+        """Return the state after a turn_on command."""
+        changes: dict[str, Any] = {"is_on": True}
+        if ATTR_BRIGHTNESS in data:
+            changes["brightness"] = data[ATTR_BRIGHTNESS]
+
+        for attr, mode in COLOR_ATTR_MODES.items():
+            if attr in data:
+                changes["color_mode"] = mode
+                changes["color"] = data[attr]
+                break
+        else:
+            if self.color_mode is None:
+                # Without a color, the light is dimmed or only switched
+                changes["color_mode"] = (
+                    ColorMode.BRIGHTNESS
+                    if ATTR_BRIGHTNESS in data
+                    else ColorMode.ONOFF
+                )
+
+        if ATTR_EFFECT in data:
+            changes["effect"] = data[ATTR_EFFECT]
+        if ATTR_WHITE in data:
+            changes["white"] = data[ATTR_WHITE]
+        return replace(self, **changes)
+
+    def turn_off(self) -> LightState:
+        """Return the state after a turn_off command."""
+        return replace(self, is_on=False) if self.is_on else self
+
+    def mirror(self, state: State) -> LightState:
+        """Return the state after the source light changed to another state."""
+        if state.state == STATE_OFF:
+            return self.turn_off()
+        if state.state != STATE_ON:
+            return self
+
+        attributes = state.attributes
+        data: dict[str, Any] = {}
+        if (brightness := attributes.get(ATTR_BRIGHTNESS)) is not None:
+            data[ATTR_BRIGHTNESS] = brightness
+        if (attr := COLOR_MODE_ATTRS.get(attributes.get(ATTR_COLOR_MODE))) and (
+            color := attributes.get(attr)
+        ) is not None:
+            data[attr] = tuple(color) if isinstance(color, list) else color
+        if ATTR_EFFECT in attributes:
+            data[ATTR_EFFECT] = attributes[ATTR_EFFECT]
+        return self.turn_on(data)
+
+    def interpolate(self, target: LightState, fraction: float) -> LightState:
+        """Return the state a fraction of the way from this state to the target.
+
+        The brightness of a light that is off counts as 0. The color is only
+        interpolated if both states are on and in the same color mode, else
+        the target color is used right away.
+        """
+        if fraction >= 1:
+            return target
+        start = (self.brightness or 255) if self.is_on else 0
+        end = (target.brightness or 255) if target.is_on else 0
+        brightness = max(1, round(start + (end - start) * fraction))
+
+        color = target.color
+        if (
+            self.is_on
+            and target.is_on
+            and self.color_mode == target.color_mode
+            and self.color is not None
+            and target.color is not None
+        ):
+            color = _interpolate_color(
+                self.color, target.color, fraction, target.color_mode == ColorMode.HS
+            )
+        # A light that is turned off keeps its color while it dims
+        if not target.is_on:
+            return replace(self, is_on=True, brightness=brightness)
+        return replace(target, is_on=True, brightness=brightness, color=color)
+
+    def with_color_mode(self, color_mode: ColorMode) -> LightState:
+        """Return the state in another color mode, dropping the color."""
+        if color_mode == self.color_mode:
+            return self
+        return replace(self, color_mode=color_mode, color=None)
+
+    def as_service_data(self) -> dict[str, Any]:
+        """Return the turn_on data that brings a light to this state."""
+        data: dict[str, Any] = {}
+        if self.brightness is not None:
+            data[ATTR_BRIGHTNESS] = self.brightness
+        if self.color is not None and (
+            attr := COLOR_MODE_ATTRS.get(self.color_mode)  # type: ignore[arg-type]
+        ):
+            data[attr] = self.color
+        if self.effect is not None:
+            data[ATTR_EFFECT] = self.effect
+        if self.white is not None:
+            data[ATTR_WHITE] = self.white
+        return data
+
+
+def _interpolate_color(start: Any, end: Any, fraction: float, hs: bool) -> Any:
+    """Return a color a fraction of the way from start to end.
+
+    Hues take the shortest way around the color wheel.
+    """
+    if not isinstance(start, (list, tuple)):
+        return round(start + (end - start) * fraction)
+    values: list[Any] = []
+    for index, (low, high) in enumerate(zip(start, end, strict=True)):
+        delta = high - low
+        if hs and index == 0:
+            delta = (delta + 180) % 360 - 180
+        value = low + delta * fraction
+        if hs and index == 0:
+            value %= 360
+        values.append(
+            round(value) if isinstance(low, int) and isinstance(high, int) else value
+        )
+    return tuple(values)
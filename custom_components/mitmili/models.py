@@ -0,0 +1,133 @@
+"""Runtime data models for the Man in the Middle Light integration."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from .batcher import ServiceCallBatcher
+from .const import DEFAULT_FADE_FRAME_RATE, DEFAULT_OFFLINE_FLUSH_JITTER
+from .expiry import OverrideExpiryScheduler
+from .pipeline import SourceCommandPipeline
+from .reconciler import Reconciler
+from .resync import ResyncScheduler
+from .scheduler import CommandScheduler
+from .tracing import CommandTracer
+
+if TYPE_CHECKING:
+    from .coordinator import MitmiliCoordinator
+
+
+@dataclass(slots=True)
+class MitmiliData:
+    """Integration-wide runtime data, shared by all config entries."""
+
+    hass: HomeAssistant
+    scheduler: CommandScheduler
+    batcher: ServiceCallBatcher
+    resync: ResyncScheduler
+    expiry: OverrideExpiryScheduler
+    tracer: CommandTracer | None = None
+    reconciler: Reconciler | None = None
+    # Frames per second sent to a source light while it cross-fades
+    fade_frame_rate: float = DEFAULT_FADE_FRAME_RATE
+    # Seconds a held command waits at most once its source light is back
+    offline_flush_jitter: float = DEFAULT_OFFLINE_FLUSH_JITTER
+    pipelines: dict[str, SourceCommandPipeline] = field(default_factory=dict)
+    # The coordinators of the loaded entries, by entry ID
+    coordinators: dict[str, MitmiliCoordinator] = field(default_factory=dict)
+    # Called with the entry ID whenever the state of an entry changes
+    listeners: list[Callable[[str], None]] = field(default_factory=list)
+    setup_count: int = 0
+    setup_duration: float = 0.0
+    setup_duration_max: float = 0.0
+
+    @callback
+    def async_record_setup(self, duration: float) -> None:
+        """Record how long setting up a config entry took."""
+        self.setup_count += 1
+        self.setup_duration += duration
+        self.setup_duration_max = max(self.setup_duration_max, duration)
+
+    @callback
+    def async_add_coordinator(self, coordinator: MitmiliCoordinator) -> CALLBACK_TYPE:
+        """Add the coordinator of a loaded entry, return a callback to remove it.
+
+        Removing the coordinator releases its pipeline, so an unloaded entry
+        sends nothing it still had pending or held.
+        """
+        entry_id = coordinator.entry.entry_id
+        self.coordinators[entry_id] = coordinator
+        self.async_entry_changed(entry_id)
+
+        @callback
+        def _async_remove() -> None:
+            if self.coordinators.get(entry_id) is coordinator:
+                del self.coordinators[entry_id]
+                self.async_entry_changed(entry_id)
+            self.async_release_pipeline(coordinator.pipeline)
+
+        return _async_remove
+
+    @callback
+    def async_add_listener(self, listener: Callable[[str], None]) -> CALLBACK_TYPE:
+        """Listen for changes of all entries, return a callback to stop."""
+        self.listeners.append(listener)
+
+        @callback
+        def _async_remove() -> None:
+            self.listeners.remove(listener)
+
+        return _async_remove
+
+    @callback
+    def async_entry_changed(self, entry_id: str) -> None:
+        """Tell the listeners that the state of an entry changed."""
+        for listener in list(self.listeners):
+            listener(entry_id)
+
+    @callback
+    def async_get_pipeline(
+        self, entity_ids: tuple[str, ...]
+    ) -> SourceCommandPipeline:
+        """Return the command pipeline for a source light or set of lights."""
+        key = ",".join(entity_ids)
+        if (pipeline := self.pipelines.get(key)) is None:
+            pipeline = self.pipelines[key] = SourceCommandPipeline(
+                self.hass,
+                self.scheduler,
+                self.batcher,
+                entity_ids,
+                self.tracer,
+                self.offline_flush_jitter,
+            )
+        return pipeline
+
+    @callback
+    def async_release_pipeline(self, pipeline: SourceCommandPipeline) -> None:
+        """Stop and forget a pipeline once no loaded entry uses it anymore."""
+        if any(
+            coordinator.pipeline is pipeline
+            for coordinator in self.coordinators.values()
+        ):
+            return
+        pipeline.async_cancel()
+        if self.pipelines.get(pipeline.key) is pipeline:
+            del self.pipelines[pipeline.key]
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Stop all pipelines and send any calls still waiting for their batch."""
+        self.resync.async_shutdown()
+        self.expiry.async_shutdown()
+        if self.reconciler is not None:
+            self.reconciler.async_shutdown()
+        self.scheduler.async_shutdown()
+        for pipeline in self.pipelines.values():
+            pipeline.async_cancel()
+        self.batcher.async_shutdown()
+        if self.tracer is not None:
+            self.tracer.async_shutdown()
@@ -0,0 +1,474 @@
+"""Per-source command pipeline for Man in the Middle Light."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+from datetime import datetime
+import logging
+import random
+import time
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components.light import (
+    ATTR_BRIGHTNESS,
+    ATTR_COLOR_MODE,
+    ATTR_TRANSITION,
+    ATTR_WHITE,
+    ColorMode,
+)
+from homeassistant.const import (
+    SERVICE_TURN_OFF,
+    SERVICE_TURN_ON,
+    STATE_OFF,
+    STATE_ON,
+    STATE_UNAVAILABLE,
+)
+from homeassistant.core import (
+    CALLBACK_TYPE,
+    Event,
+    EventStateChangedData,
+    HomeAssistant,
+    State,
+    callback,
+)
+from homeassistant.helpers.event import async_track_state_change_event
+from homeassistant.util import dt as dt_util
+
+from .batcher import ServiceCallBatcher, call_key
+from .light_state import COLOR_ATTRS
+from .scheduler import CommandPriority, CommandScheduler
+from .stats import SourceStats
+
+if TYPE_CHECKING:
+    from .tracing import CommandTracer
+
+_LOGGER = logging.getLogger(__name__)
+
+# Float color components are compared with this tolerance
+_FLOAT_TOLERANCE = 0.01
+
+
+def _values_match(desired: Any, current: Any) -> bool:
+    """Return if a desired attribute value matches the current value."""
+    if current is None:
+        return False
+    if isinstance(desired, (list, tuple)):
+        if not isinstance(current, (list, tuple)) or len(desired) != len(current):
+            return False
+        return all(_values_match(d, c) for d, c in zip(desired, current, strict=True))
+    if isinstance(desired, float) or isinstance(current, float):
+        return abs(desired - current) <= _FLOAT_TOLERANCE
+    return bool(desired == current)
+
+
+def diff_against_state(
+    service: str, data: Mapping[str, Any], state: State
+) -> dict[str, Any] | None:
+    """Return the part of a command that differs from the current state.
+
+    Returns None if the source light is already in the desired state.
+    """
+    if service == SERVICE_TURN_OFF:
+        return None if state.state == STATE_OFF else dict(data)
+
+    if state.state != STATE_ON:
+        return dict(data)
+
+    attributes = state.attributes
+    diff: dict[str, Any] = {}
+    for attr, value in data.items():
+        if attr == ATTR_TRANSITION:
+            continue
+        if attr == ATTR_WHITE:
+            current = (
+                attributes.get(ATTR_BRIGHTNESS)
+                if attributes.get(ATTR_COLOR_MODE) == ColorMode.WHITE
+                else None
+            )
+        else:
+            current = attributes.get(attr)
+        if not _values_match(value, current):
+            diff[attr] = value
+
+    if not diff:
+        return None
+    if ATTR_TRANSITION in data:
+        diff[ATTR_TRANSITION] = data[ATTR_TRANSITION]
+    return diff
+
+
+@dataclass(slots=True)
+class _PendingCommand:
+    """The command that will be sent next to a source light."""
+
+    service: str
+    data: dict[str, Any]
+    priority: CommandPriority
+    # When the oldest command merged into this one was submitted
+    submitted: float = field(default_factory=time.monotonic)
+
+
+class SourceCommandPipeline:
+    """Serialize and coalesce the commands sent to a source light.
+
+    The source can be a set of lights that are controlled together, in which
+    case every command is sent as a single call targeting all of them.
+
+    At most one command per source light is in flight. Commands submitted while
+    a command is in flight, or waiting for the scheduler, are merged into a
+    single pending command holding the newest desired state, and superseded
+    commands are never sent. Because the next command is only sent after the
+    previous one has completed, the last submitted command is always the state
+    the source light ends up in.
+
+    Before a command is sent it is compared with the current state of the
+    source lights, and only the attributes that differ are sent.
+
+    A fade submits a series of commands as frames, spaced in time. Frames
+    the source light cannot keep up with are merged like any other command,
+    so a slow source light gets fewer frames but always ends in the last one.
+    A command submitted during a fade cancels the rest of it, and is merged
+    into the last frame, so the source light ends in the state the fade was
+    heading for and not somewhere in between.
+
+    While none of the source lights is available, the pending command is held
+    instead of sent, and commands submitted in the meantime are merged into
+    it. It is sent once a source light is available again, after a random
+    delay, so source lights that come back together are not all sent their
+    command at once.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        scheduler: CommandScheduler,
+        batcher: ServiceCallBatcher,
+        entity_ids: tuple[str, ...],
+        tracer: CommandTracer | None = None,
+        flush_jitter: float = 0.0,
+    ) -> None:
+        """Initialize the pipeline."""
+        self.hass = hass
+        self.entity_ids = entity_ids
+        self.key = ",".join(entity_ids)
+        self._scheduler = scheduler
+        self._batcher = batcher
+        self._tracer = tracer
+        self._flush_jitter = flush_jitter
+        self._pending: _PendingCommand | None = None
+        self._task: asyncio.Task[None] | None = None
+        self._fade: asyncio.Task[None] | None = None
+        # The last frame of the running fade
+        self._fade_target: tuple[str, dict[str, Any]] | None = None
+        # The pending command is held while the source lights are unavailable
+        self._holding = False
+        self._unsub_available: CALLBACK_TYPE | None = None
+        self._flush_timer: asyncio.TimerHandle | None = None
+        self._last_sent: datetime | None = None
+        self._last_command: tuple[str, dict[str, Any]] | None = None
+        self.stats = SourceStats()
+
+    @property
+    def busy(self) -> bool:
+        """Return if a command is pending or in flight, or a fade is running.
+
+        A command held while the source lights are unavailable is pending too.
+        """
+        return (
+            self._pending is not None
+            or (self._task is not None and not self._task.done())
+            or (self._fade is not None and not self._fade.done())
+        )
+
+    @property
+    def last_sent(self) -> datetime | None:
+        """Return when the last command was sent."""
+        return self._last_sent
+
+    @callback
+    def async_is_own_change(self, state: State) -> bool:
+        """Return if a state change of a source light may be caused by us.
+
+        That is the case if the state carries the context of one of our calls,
+        if a command is pending or in flight, or if the state matches the last
+        command sent, for integrations that do not pass on the context.
+        """
+        if self._batcher.async_is_own_context(state.context):
+            return True
+        if self.busy:
+            return True
+        return (
+            self._last_command is not None
+            and diff_against_state(*self._last_command, state) is None
+        )
+
+    @callback
+    def async_submit(
+        self,
+        service: str,
+        data: Mapping[str, Any],
+        *,
+        replace: bool = False,
+        priority: CommandPriority = CommandPriority.INTERACTIVE,
+    ) -> None:
+        """Submit a command for the source light.
+
+        A turn_on command is merged into a pending turn_on command, unless
+        replace is set. Any other combination replaces the pending command.
+        The pending command keeps the highest priority of the commands it holds.
+        """
+        if (target := self._async_cancel_fade()) is not None:
+            self._async_queue(*target, True, priority)
+        self._async_queue(service, data, replace, priority)
+
+    @callback
+    def async_fade(
+        self,
+        frames: Sequence[tuple[str, dict[str, Any]]],
+        interval: float,
+        priority: CommandPriority = CommandPriority.INTERACTIVE,
+    ) -> None:
+        """Submit the frames of a fade, one every interval seconds."""
+        self._async_cancel_fade()
+        if len(frames) < 2:
+            for service, data in frames:
+                self._async_queue(service, data, True, priority)
+            return
+        self.stats.fades += 1
+        self._fade_target = frames[-1]
+        self._fade = self.hass.async_create_background_task(
+            self._async_run_fade(frames, interval, priority),
+            f"mitmili fade {self.key}",
+        )
+
+    async def _async_run_fade(
+        self,
+        frames: Sequence[tuple[str, dict[str, Any]]],
+        interval: float,
+        priority: CommandPriority,
+    ) -> None:
+        """Submit the frames of a fade."""
+        for index, (service, data) in enumerate(frames):
+            if index:
+                await asyncio.sleep(interval)
+            self._async_queue(service, data, True, priority)
+
+    @callback
+    def _async_cancel_fade(self) -> tuple[str, dict[str, Any]] | None:
+        """Stop submitting the frames of a running fade.
+
+        Returns the last frame if the fade was still running.
+        """
+        fade, target = self._fade, self._fade_target
+        self._fade = self._fade_target = None
+        if fade is None or fade.done():
+            return None
+        fade.cancel()
+        self.stats.fades_cancelled += 1
+        _LOGGER.debug("Cancelled fade for %s", self.key)
+        return target
+
+    @callback
+    def _async_queue(
+        self,
+        service: str,
+        data: Mapping[str, Any],
+        replace: bool,
+        priority: CommandPriority,
+    ) -> None:
+        """Merge a command into the pending command and send it."""
+        pending = self._pending
+        if pending is None:
+            self._pending = _PendingCommand(service, dict(data), priority)
+        else:
+            if (
+                not replace
+                and pending.service == SERVICE_TURN_ON
+                and service == SERVICE_TURN_ON
+            ):
+                if not COLOR_ATTRS.isdisjoint(data):
+                    for attr in COLOR_ATTRS:
+                        pending.data.pop(attr, None)
+                pending.data.update(data)
+                self.stats.merged += 1
+                _LOGGER.debug(
+                    "Merged pending command for %s: %s", self.key, pending.data
+                )
+            else:
+                self.stats.merged += 1
+                _LOGGER.debug(
+                    "Dropped superseded light.%s for %s",
+                    pending.service,
+                    self.key,
+                )
+                pending.service = service
+                pending.data = dict(data)
+            if priority < pending.priority:
+                pending.priority = priority
+                self._scheduler.async_reprioritize(self.key, priority)
+
+        if self._holding:
+            return
+        # Background tasks start eagerly and may already be done here
+        if self._task is None or self._task.done():
+            self._task = self.hass.async_create_background_task(
+                self._async_run(), f"mitmili pipeline {self.key}"
+            )
+
+    async def _async_run(self) -> None:
+        """Send pending commands until there are none left."""
+        while (pending := self._pending) is not None:
+            if self._async_unavailable():
+                self._async_hold(pending)
+                return
+
+            # Skip commands that would not change anything without waiting
+            if (diff := self._async_diff(pending.service, pending.data)) is None:
+                self._pending = None
+                self.stats.skipped += 1
+                _LOGGER.debug(
+                    "Skipped light.%s for %s, already in desired state",
+                    pending.service,
+                    self.key,
+                )
+                continue
+
+            # Commands submitted while waiting are merged into the pending one,
+            # commands the batcher sends in one call share a token
+            if not await self._scheduler.async_acquire(
+                self.key,
+                self.entity_ids[0],
+                pending.priority,
+                call_key(pending.service, diff),
+            ):
+                # Only reconciliation is dropped, the next round retries it. A
+                # command merged in while waiting raised the priority, and is
+                # queued again
+                if pending.priority == CommandPriority.RECONCILE:
+                    self._pending = None
+                    self.stats.dropped += 1
+                continue
+
+            self._pending = None
+            if (diff := self._async_diff(pending.service, pending.data)) is None:
+                self.stats.skipped += 1
+                continue
+            self._last_sent = dt_util.utcnow()
+            self._last_command = (pending.service, pending.data)
+            self.stats.sent += 1
+            start = time.monotonic()
+            future, context = self._batcher.async_queue(
+                pending.service, self.entity_ids, diff
+            )
+            if self._tracer is not None:
+                self._tracer.async_start(
+                    self, context, pending.service, diff, pending.submitted
+                )
+            if await future:
+                self.stats.latency.record(time.monotonic() - start)
+            else:
+                self.stats.failed += 1
+
+    @callback
+    def _async_unavailable(self) -> bool:
+        """Return if none of the source lights is available."""
+        for entity_id in self.entity_ids:
+            state = self.hass.states.get(entity_id)
+            if state is not None and state.state != STATE_UNAVAILABLE:
+                return False
+        return True
+
+    @callback
+    def _async_hold(self, pending: _PendingCommand) -> None:
+        """Hold the pending command until a source light is available."""
+        self._holding = True
+        self.stats.held += 1
+        _LOGGER.debug(
+            "Source lights %s unavailable, holding light.%s",
+            self.key,
+            pending.service,
+        )
+        if self._unsub_available is None:
+            self._unsub_available = async_track_state_change_event(
+                self.hass, self.entity_ids, self._async_source_changed
+            )
+
+    @callback
+    def _async_source_changed(self, event: Event[EventStateChangedData]) -> None:
+        """Flush the held command once a source light is available again."""
+        new_state = event.data["new_state"]
+        if new_state is None or new_state.state == STATE_UNAVAILABLE:
+            return
+        self._async_stop_holding()
+        self._flush_timer = self.hass.loop.call_later(
+            random.uniform(0, self._flush_jitter), self._async_flush
+        )
+
+    @callback
+    def _async_flush(self) -> None:
+        """Send the command held while the source lights were unavailable."""
+        self._flush_timer = None
+        self._holding = False
+        if (pending := self._pending) is None:
+            return
+        self.stats.flushed += 1
+        _LOGGER.debug(
+            "Source lights %s available, sending held light.%s",
+            self.key,
+            pending.service,
+        )
+        # The command is no longer a direct response to the user
+        pending.priority = max(pending.priority, CommandPriority.BULK)
+        if self._task is None or self._task.done():
+            self._task = self.hass.async_create_background_task(
+                self._async_run(), f"mitmili pipeline {self.key}"
+            )
+
+    @callback
+    def _async_stop_holding(self) -> None:
+        """Stop waiting for the source lights to become available."""
+        if self._unsub_available is not None:
+            self._unsub_available()
+            self._unsub_available = None
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+
+    async def async_wait_idle(self) -> None:
+        """Wait until all submitted commands have been handled."""
+        if self._task is not None and not self._task.done():
+            await asyncio.shield(self._task)
+
+    @callback
+    def _async_diff(self, service: str, data: dict[str, Any]) -> dict[str, Any] | None:
+        """Return the command to send, or None if it would not change anything.
+
+        With multiple source lights, the attributes that differ for any of them
+        are sent to all of them.
+        """
+        diff: dict[str, Any] | None = None
+        for entity_id in self.entity_ids:
+            state = self.hass.states.get(entity_id)
+            if state is None or state.state not in (STATE_ON, STATE_OFF):
+                return data
+
+            # The state is stale if the source has not reported since our last
+            # command, comparing against it could skip a command that is needed
+            if self._last_sent is not None and state.last_reported < self._last_sent:
+                return data
+
+            if (member_diff := diff_against_state(service, data, state)) is not None:
+                diff = member_diff if diff is None else diff | member_diff
+        return diff
+
+    @callback
+    def async_cancel(self) -> None:
+        """Drop the pending command and stop waiting for the in-flight one."""
+        self._async_cancel_fade()
+        self._async_stop_holding()
+        self._holding = False
+        self._pending = None
+        if self._task is not None:
+            self._task.cancel()
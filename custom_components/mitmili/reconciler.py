@@ -0,0 +1,142 @@
+"""Background reconciliation of source lights with their active lights."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import timedelta
+import logging
+import random
+from typing import TYPE_CHECKING
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util import dt as dt_util
+
+from .scheduler import CommandPriority, TokenBucket
+
+if TYPE_CHECKING:
+    from .coordinator import MitmiliCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+# Source lights that were sent a command this recently may not have reported
+# their new state yet, and are checked in the next round
+_SETTLE_TIME = timedelta(seconds=30)
+
+
+class Reconciler:
+    """Heal drift between source lights and their active lights.
+
+    Commands can get lost on the way to a source light, after which the source
+    light no longer matches the light that controls it. The reconciler checks
+    all entries in rounds, and syncs the active light of every entry whose
+    source light differs. The pipeline only sends the attributes that differ.
+
+    Syncs are sent with the lowest priority, at most the budget per minute and
+    each after a random delay, so they never compete with other commands.
+    Entries with a command pending or in flight are skipped.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, budget: float, interval: float, jitter: float
+    ) -> None:
+        """Initialize the reconciler."""
+        self.hass = hass
+        self._interval = interval
+        self._jitter = jitter
+        self._bucket = TokenBucket(budget / 60)
+        self._coordinators: dict[str, MitmiliCoordinator] = {}
+        self._task: asyncio.Task[None] | None = None
+        self.rounds = 0
+        self.checked = 0
+        self.drifted = 0
+        self.corrected = 0
+        self.last_round_drifted = 0
+
+    @property
+    def drift_rate(self) -> float | None:
+        """Return the fraction of checked entries that had drifted."""
+        return self.drifted / self.checked if self.checked else None
+
+    @callback
+    def async_register(self, coordinator: MitmiliCoordinator) -> None:
+        """Include an entry in the rounds."""
+        self._coordinators[coordinator.entry.entry_id] = coordinator
+        if self._task is None or self._task.done():
+            self._task = self.hass.async_create_background_task(
+                self._async_run(), "mitmili reconcile"
+            )
+
+    @callback
+    def async_unregister(self, coordinator: MitmiliCoordinator) -> None:
+        """Exclude an entry from the rounds."""
+        self._coordinators.pop(coordinator.entry.entry_id, None)
+
+    async def _async_run(self) -> None:
+        """Run rounds while there are entries."""
+        while self._coordinators:
+            await asyncio.sleep(self._interval)
+            await self._async_round()
+
+    async def _async_round(self) -> None:
+        """Check every entry once."""
+        self.rounds += 1
+        drifted = 0
+        for coordinator in list(self._coordinators.values()):
+            if coordinator.entry.entry_id not in self._coordinators or (
+                result := self._async_check(coordinator)
+            ) is None:
+                continue
+            self.checked += 1
+            if not result:
+                continue
+            drifted += 1
+
+            # Wait for the budget, and check again as things may have changed
+            if delay := self._bucket.delay():
+                await asyncio.sleep(delay)
+            if self._jitter:
+                await asyncio.sleep(random.uniform(0, self._jitter))
+            if (
+                coordinator.entry.entry_id not in self._coordinators
+                or not self._async_check(coordinator)
+                or (light := coordinator.active_light) is None
+            ):
+                continue
+            self._bucket.consume()
+            self.corrected += 1
+            coordinator.stats.reconciled += 1
+            _LOGGER.debug(
+                "Source lights %s drifted from %s, syncing",
+                coordinator.source_entity_ids,
+                light.name,
+            )
+            light.async_sync_to_source(CommandPriority.RECONCILE)
+
+        self.last_round_drifted = drifted
+        self.drifted += drifted
+
+    @callback
+    def _async_check(self, coordinator: MitmiliCoordinator) -> bool | None:
+        """Return if the source lights of an entry drifted from its active light.
+
+        Returns None if the entry cannot be checked now.
+        """
+        pipeline = coordinator.pipeline
+        if (
+            not coordinator.ready
+            or pipeline.busy
+            or (light := coordinator.active_light) is None
+        ):
+            return None
+        if (
+            last_sent := pipeline.last_sent
+        ) is not None and dt_util.utcnow() - last_sent < _SETTLE_TIME:
+            return None
+        return coordinator.async_source_differs(light)
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Stop reconciling."""
+        self._coordinators.clear()
+        if self._task is not None:
+            self._task.cancel()
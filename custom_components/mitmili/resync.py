@@ -0,0 +1,116 @@
+"""Staged resync of proxy lights to their source lights."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from typing import TYPE_CHECKING
+
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.start import async_at_started
+
+if TYPE_CHECKING:
+    from .coordinator import MitmiliCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ResyncScheduler:
+    """Release entries to their source lights without a thundering herd.
+
+    Entries hold back their commands until they are released. Entries set up
+    while Home Assistant is starting are released once it has started, entries
+    set up later, for example after a reload, right away. Entries are released
+    with limited concurrency and a random delay, and commands that were held
+    back are replayed as a single sync, so the source lights do not all receive
+    a command at once.
+    """
+
+    def __init__(self, hass: HomeAssistant, concurrency: int, jitter: float) -> None:
+        """Initialize the scheduler."""
+        self.hass = hass
+        self._concurrency = concurrency
+        self._jitter = jitter
+        self._queue: dict[str, MitmiliCoordinator] = {}
+        self._task: asyncio.Task[None] | None = None
+        self._started = False
+        self.last_duration: float | None = None
+        self.last_count = 0
+
+        async_at_started(hass, self._async_hass_started)
+
+    @callback
+    def _async_hass_started(self, hass: HomeAssistant) -> None:
+        """Start resyncing the entries that were set up during startup."""
+        self._started = True
+        self._async_start()
+
+    @callback
+    def async_schedule(self, coordinator: MitmiliCoordinator) -> None:
+        """Queue an entry for resync."""
+        self._queue[coordinator.entry.entry_id] = coordinator
+        if self._started:
+            self._async_start()
+
+    @callback
+    def async_unschedule(self, coordinator: MitmiliCoordinator) -> None:
+        """Remove an entry from the queue."""
+        self._queue.pop(coordinator.entry.entry_id, None)
+
+    @callback
+    def _async_start(self) -> None:
+        """Start working through the queue, unless already doing so."""
+        if not self._queue or (self._task is not None and not self._task.done()):
+            return
+        self._task = self.hass.async_create_background_task(
+            self._async_run(), "mitmili resync"
+        )
+
+    async def _async_run(self) -> None:
+        """Resync all queued entries, including those queued while running."""
+        semaphore = asyncio.Semaphore(self._concurrency)
+        start = time.monotonic()
+        count = 0
+
+        while self._queue:
+            queue, self._queue = self._queue, {}
+            await asyncio.gather(
+                *(
+                    self._async_resync(semaphore, coordinator)
+                    for coordinator in queue.values()
+                )
+            )
+            count += len(queue)
+
+        self.last_duration = time.monotonic() - start
+        self.last_count = count
+        _LOGGER.info(
+            "Released %d entries to their source lights in %.2f seconds",
+            count,
+            self.last_duration,
+        )
+
+    async def _async_resync(
+        self, semaphore: asyncio.Semaphore, coordinator: MitmiliCoordinator
+    ) -> None:
+        """Release a single entry once a slot is free."""
+        async with semaphore:
+            if coordinator.entry.state is not ConfigEntryState.LOADED:
+                return
+            # Only spread out entries that will actually send a command,
+            # including those that only have to sync their restored state
+            if self._jitter and coordinator.async_resync_needed():
+                await asyncio.sleep(random.uniform(0, self._jitter))
+                if coordinator.entry.state is not ConfigEntryState.LOADED:
+                    return
+            await coordinator.async_resync()
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Stop resyncing."""
+        self._queue.clear()
+        if self._task is not None:
+            self._task.cancel()
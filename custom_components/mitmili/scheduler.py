@@ -0,0 +1,289 @@
+"""Rate limited scheduling of commands to source lights."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Hashable
+from dataclasses import dataclass
+from enum import IntEnum
+import heapq
+import itertools
+import logging
+import time
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CommandPriority(IntEnum):
+    """Priority of a command, lower values are sent first."""
+
+    INTERACTIVE = 0
+    BULK = 1
+    RECONCILE = 2
+
+
+class TokenBucket:
+    """Token bucket allowing a sustained rate with bursts of up to one second."""
+
+    __slots__ = ("_burst", "_rate", "_tokens", "_updated")
+
+    def __init__(self, rate: float) -> None:
+        """Initialize the bucket, full."""
+        self._rate = rate
+        self._burst = max(1.0, rate)
+        self._tokens = self._burst
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        """Add the tokens that accumulated since the last refill."""
+        now = time.monotonic()
+        self._tokens = min(
+            self._burst, self._tokens + (now - self._updated) * self._rate
+        )
+        self._updated = now
+
+    def delay(self) -> float:
+        """Return the number of seconds until a token is available."""
+        self._refill()
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self._rate
+
+    def consume(self) -> None:
+        """Take a token."""
+        self._tokens -= 1
+
+
+@dataclass(slots=True)
+class _Waiter:
+    """A source light waiting for permission to send a command."""
+
+    key: str
+    platform: str | None
+    priority: CommandPriority
+    seq: int
+    future: asyncio.Future[bool]
+    # Waiters with the same batch key are sent as a single call
+    batch_key: Hashable | None = None
+
+
+class CommandScheduler:
+    """Grant permission to send commands, within global and per-integration rates.
+
+    Each source light waits for at most one command at a time; newer commands
+    are merged into it by its pipeline while it waits. Interactive commands are
+    granted before bulk syncs, and those before reconciliation.
+
+    A token is taken per outgoing call rather than per source light: when a
+    waiter is granted, the waiters of the same integration with the same batch
+    key, whose commands the batcher merges into its call, are granted with it.
+
+    If more source lights are waiting than the queue allows, the oldest
+    reconciliation command is dropped; the next reconciliation round retries
+    it. Other commands hold the latest desired state of their source light and
+    are never dropped, the queue is bounded by the number of source lights.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        rate: float | None,
+        platform_rates: dict[str, float],
+        max_queue: int,
+    ) -> None:
+        """Initialize the scheduler."""
+        self.hass = hass
+        self._bucket = TokenBucket(rate) if rate else None
+        self._platform_rates = platform_rates
+        self._platform_buckets: dict[str, TokenBucket] = {}
+        self._max_queue = max_queue
+        self._waiters: dict[str, _Waiter] = {}
+        self._heap: list[tuple[int, int, _Waiter]] = []
+        # Waiters by integration and batch key, then by source light key
+        self._batches: dict[tuple[str | None, Hashable], dict[str, _Waiter]] = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self.dropped = 0
+        # Waiters granted without a token, as part of another waiter's call
+        self.batched = 0
+
+    @callback
+    def _async_get_platform(self, entity_id: str) -> str | None:
+        """Return the integration providing a source light."""
+        if not self._platform_rates:
+            return None
+        entity_entry = er.async_get(self.hass).async_get(entity_id)
+        return entity_entry.platform if entity_entry else None
+
+    @callback
+    def _async_get_platform_bucket(self, platform: str | None) -> TokenBucket | None:
+        """Return the token bucket of an integration, if it is rate limited."""
+        if platform is None or platform not in self._platform_rates:
+            return None
+        if (bucket := self._platform_buckets.get(platform)) is None:
+            bucket = self._platform_buckets[platform] = TokenBucket(
+                self._platform_rates[platform]
+            )
+        return bucket
+
+    async def async_acquire(
+        self,
+        key: str,
+        entity_id: str,
+        priority: CommandPriority,
+        batch_key: Hashable | None = None,
+    ) -> bool:
+        """Wait for permission to send a command to a source light.
+
+        The key identifies the source light, or set of source lights, the
+        entity ID is used to find the integration providing it. Commands with
+        the same batch key share a token. Returns False if the command was
+        dropped because the queue was full.
+        """
+        if self._bucket is None and not self._platform_rates:
+            return True
+
+        waiter = _Waiter(
+            key,
+            self._async_get_platform(entity_id),
+            priority,
+            next(self._seq),
+            self.hass.loop.create_future(),
+            batch_key,
+        )
+        self._waiters[key] = waiter
+        heapq.heappush(self._heap, (priority, waiter.seq, waiter))
+        if batch_key is not None:
+            self._batches.setdefault((waiter.platform, batch_key), {})[key] = waiter
+
+        if len(self._waiters) > self._max_queue:
+            self._async_drop_one()
+
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            # Started lazily, so all commands made in this event loop iteration
+            # are waiting before the first is granted, and can share its call
+            self._task = self.hass.async_create_background_task(
+                self._async_run(), "mitmili command scheduler", eager_start=False
+            )
+
+        try:
+            return await waiter.future
+        finally:
+            if self._waiters.get(key) is waiter:
+                del self._waiters[key]
+            if batch_key is not None:
+                batch_id = (waiter.platform, batch_key)
+                if (batch := self._batches.get(batch_id)) is not None and (
+                    batch.get(key) is waiter
+                ):
+                    del batch[key]
+                    if not batch:
+                        del self._batches[batch_id]
+
+    @callback
+    def async_reprioritize(self, key: str, priority: CommandPriority) -> None:
+        """Raise the priority of a waiting source light."""
+        if (waiter := self._waiters.get(key)) is None:
+            return
+        if priority < waiter.priority:
+            waiter.priority = priority
+            # The old heap entry is skipped once its priority no longer matches
+            heapq.heappush(self._heap, (priority, waiter.seq, waiter))
+            self._wakeup.set()
+
+    @callback
+    def _async_drop_one(self) -> None:
+        """Drop the oldest reconciliation command, if one is waiting."""
+        victim: _Waiter | None = None
+        for waiter in self._waiters.values():
+            if waiter.priority == CommandPriority.RECONCILE and (
+                victim is None or waiter.seq < victim.seq
+            ):
+                victim = waiter
+        if victim is None:
+            return
+        del self._waiters[victim.key]
+        self.dropped += 1
+        _LOGGER.warning(
+            "Command queue full, dropped command for %s", victim.key
+        )
+        if not victim.future.done():
+            victim.future.set_result(False)
+
+    @callback
+    def _async_next(self) -> tuple[_Waiter | None, float]:
+        """Return the next waiter that may send, or how long to wait."""
+        # Drop stale heap entries of granted, dropped or reprioritized waiters
+        while self._heap:
+            priority, _, waiter = self._heap[0]
+            if waiter.future.done() or priority != waiter.priority:
+                heapq.heappop(self._heap)
+                continue
+            break
+        if not self._heap:
+            return None, 0.0
+
+        if self._bucket is not None and (delay := self._bucket.delay()) > 0:
+            return None, delay
+
+        # Skip waiters whose integration is out of tokens
+        min_delay = float("inf")
+        for priority, _, waiter in sorted(self._heap):
+            if waiter.future.done() or priority != waiter.priority:
+                continue
+            bucket = self._async_get_platform_bucket(waiter.platform)
+            if bucket is None or (delay := bucket.delay()) <= 0:
+                if bucket is not None:
+                    bucket.consume()
+                return waiter, 0.0
+            min_delay = min(min_delay, delay)
+        return None, min_delay
+
+    async def _async_run(self) -> None:
+        """Grant permission to waiters as tokens become available."""
+        while self._waiters:
+            waiter, delay = self._async_next()
+            if waiter is not None:
+                if self._bucket is not None:
+                    self._bucket.consume()
+                waiter.future.set_result(True)
+                self._async_grant_batch(waiter)
+                continue
+            if not self._heap:
+                break
+            self._wakeup.clear()
+            try:
+                async with asyncio.timeout(delay):
+                    await self._wakeup.wait()
+            except TimeoutError:
+                pass
+
+    @callback
+    def _async_grant_batch(self, granted: _Waiter) -> None:
+        """Grant the waiters whose commands are sent in the same call."""
+        if granted.batch_key is None:
+            return
+        batch = self._batches.pop((granted.platform, granted.batch_key), None)
+        if batch is None:
+            return
+        for waiter in batch.values():
+            if not waiter.future.done():
+                waiter.future.set_result(True)
+                self.batched += 1
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Stop granting permission."""
+        if self._task is not None:
+            self._task.cancel()
+        for waiter in self._waiters.values():
+            if not waiter.future.done():
+                waiter.future.set_result(False)
+        self._waiters.clear()
+        self._heap.clear()
+        self._batches.clear()
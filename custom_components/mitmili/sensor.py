@@ -0,0 +1,103 @@
+"""Diagnostic sensor platform for Man in the Middle Light integration."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.const import EntityCategory
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .coordinator import MitmiliConfigEntry, MitmiliCoordinator
+
+# Counters change with every command, poll them instead of writing state
+SCAN_INTERVAL = timedelta(seconds=60)
+
+
+@dataclass(frozen=True, kw_only=True)
+class MitmiliSensorEntityDescription(SensorEntityDescription):
+    """Describes a Man in the Middle Light diagnostic sensor."""
+
+    value_fn: Callable[[MitmiliCoordinator], int | datetime | None]
+
+
+SENSORS: tuple[MitmiliSensorEntityDescription, ...] = (
+    MitmiliSensorEntityDescription(
+        key="source_calls_sent",
+        name="source calls sent",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda coordinator: coordinator.pipeline.stats.sent,
+    ),
+    MitmiliSensorEntityDescription(
+        key="source_calls_suppressed",
+        name="source calls suppressed",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda coordinator: (
+            coordinator.pipeline.stats.skipped + coordinator.pipeline.stats.merged
+        ),
+    ),
+    MitmiliSensorEntityDescription(
+        key="source_calls_failed",
+        name="source calls failed",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda coordinator: coordinator.pipeline.stats.failed,
+    ),
+    MitmiliSensorEntityDescription(
+        key="switch_toggles",
+        name="switch toggles",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda coordinator: coordinator.stats.switch_toggles,
+    ),
+    MitmiliSensorEntityDescription(
+        key="last_sync",
+        name="last sync",
+        device_class=SensorDeviceClass.TIMESTAMP,
+        value_fn=lambda coordinator: coordinator.stats.last_sync,
+    ),
+)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    entry: MitmiliConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Set up Man in the Middle Light diagnostic sensors."""
+    async_add_entities(
+        MitmiliDiagnosticSensor(hass, entry, description) for description in SENSORS
+    )
+
+
+class MitmiliDiagnosticSensor(SensorEntity):
+    """Diagnostic counter of the traffic of a Man in the Middle Light."""
+
+    entity_description: MitmiliSensorEntityDescription
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: MitmiliConfigEntry,
+        description: MitmiliSensorEntityDescription,
+    ) -> None:
+        """Initialize the sensor."""
+        self.entity_description = description
+        self._coordinator = entry.runtime_data
+        self._attr_unique_id = f"{entry.entry_id}_{description.key}"
+        self._attr_name = f"{entry.title} {description.name}"
+
+        # Link this entity to the source entity's device
+        self.device_entry = self._coordinator.device
+
+    async def async_update(self) -> None:
+        """Read the counter from the coordinator."""
+        self._attr_native_value = self.entity_description.value_fn(self._coordinator)
@@ -0,0 +1,99 @@
+"""Services for the Man in the Middle Light integration."""
+
+from __future__ import annotations
+
+from datetime import datetime
+import logging
+
+import voluptuous as vol
+
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.const import ATTR_CONFIG_ENTRY_ID
+from homeassistant.core import HomeAssistant, ServiceCall, callback
+from homeassistant.helpers import config_validation as cv, entity_registry as er
+from homeassistant.helpers.service import async_extract_referenced_entity_ids
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    ATTR_DURATION,
+    ATTR_OVERRIDDEN,
+    ATTR_UNTIL,
+    DOMAIN,
+    SERVICE_SET_OVERRIDDEN,
+)
+from .coordinator import MitmiliConfigEntry
+from .scheduler import CommandPriority
+
+_LOGGER = logging.getLogger(__name__)
+
+SET_OVERRIDDEN_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_OVERRIDDEN): cv.boolean,
+        vol.Exclusive(ATTR_DURATION, "end"): cv.positive_time_period,
+        vol.Exclusive(ATTR_UNTIL, "end"): cv.datetime,
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): vol.All(cv.ensure_list, [cv.string]),
+        **cv.ENTITY_SERVICE_FIELDS,
+    }
+)
+
+
+@callback
+def _async_get_target_entry_ids(hass: HomeAssistant, call: ServiceCall) -> set[str]:
+    """Return the IDs of the config entries targeted by a service call."""
+    entry_ids = set(call.data.get(ATTR_CONFIG_ENTRY_ID, []))
+
+    # Areas, floors, labels and devices are resolved to our own entities,
+    # which are linked to the device of their source light
+    selected = async_extract_referenced_entity_ids(hass, call)
+    ent_reg = er.async_get(hass)
+    for entity_id in selected.referenced | selected.indirectly_referenced:
+        entity_entry = ent_reg.async_get(entity_id)
+        if (
+            entity_entry is not None
+            and entity_entry.platform == DOMAIN
+            and entity_entry.config_entry_id is not None
+        ):
+            entry_ids.add(entity_entry.config_entry_id)
+
+    return entry_ids
+
+
+async def _async_set_overridden(call: ServiceCall) -> None:
+    """Set the overridden switch of all targeted entries in one pass."""
+    hass = call.hass
+    overridden: bool = call.data[ATTR_OVERRIDDEN]
+
+    # All entries share the same end time, so they are reverted as one batch
+    until: datetime | None = None
+    if ATTR_DURATION in call.data:
+        until = dt_util.utcnow() + call.data[ATTR_DURATION]
+    elif ATTR_UNTIL in call.data:
+        until = dt_util.as_utc(call.data[ATTR_UNTIL])
+
+    entry_ids = _async_get_target_entry_ids(hass, call)
+    _LOGGER.debug(
+        "Setting overridden=%s for %d entries", overridden, len(entry_ids)
+    )
+    for entry_id in entry_ids:
+        entry: MitmiliConfigEntry | None = hass.config_entries.async_get_entry(
+            entry_id
+        )
+        if (
+            entry is not None
+            and entry.domain == DOMAIN
+            and entry.state is ConfigEntryState.LOADED
+        ):
+            entry.runtime_data.async_set_overridden(
+                overridden, CommandPriority.BULK, until
+            )
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the integration services."""
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SET_OVERRIDDEN,
+        _async_set_overridden,
+        schema=SET_OVERRIDDEN_SCHEMA,
+    )
@@ -0,0 +1,152 @@
+"""Runtime counters for the Man in the Middle Light integration."""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from datetime import datetime
+from typing import Any
+
+# Upper bounds in seconds of the latency histogram buckets, the last bucket
+# counts everything slower
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyHistogram:
+    """Fixed-size histogram of call latencies."""
+
+    __slots__ = ("counts", "total")
+
+    def __init__(self) -> None:
+        """Initialize an empty histogram."""
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+
+    def record(self, seconds: float) -> None:
+        """Count a call that took the given number of seconds."""
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += seconds
+
+    def merge(self, other: LatencyHistogram) -> None:
+        """Add the counts of another histogram to this one."""
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.total += other.total
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the histogram as a dict."""
+        count = sum(self.counts)
+        buckets = {f"le_{bound}": n for bound, n in zip(LATENCY_BUCKETS, self.counts)}
+        buckets["le_inf"] = self.counts[-1]
+        return {
+            "count": count,
+            "mean": self.total / count if count else None,
+            "buckets": buckets,
+        }
+
+
+class SourceStats:
+    """Counters of the calls made to a source light."""
+
+    __slots__ = (
+        "confirm_latency",
+        "confirmed",
+        "dropped",
+        "fades",
+        "fades_cancelled",
+        "failed",
+        "flushed",
+        "held",
+        "latency",
+        "merged",
+        "sent",
+        "skipped",
+        "unconfirmed",
+    )
+
+    def __init__(self) -> None:
+        """Initialize the counters."""
+        self.sent = 0
+        self.skipped = 0
+        self.merged = 0
+        self.dropped = 0
+        self.failed = 0
+        self.latency = LatencyHistogram()
+        self.fades = 0
+        self.fades_cancelled = 0
+        # Commands held while the source lights were unavailable, and sent later
+        self.held = 0
+        self.flushed = 0
+        # Only counted while tracing is enabled
+        self.confirmed = 0
+        self.unconfirmed = 0
+        self.confirm_latency = LatencyHistogram()
+
+    def merge(self, other: SourceStats) -> None:
+        """Add the counters of another source to these."""
+        self.sent += other.sent
+        self.skipped += other.skipped
+        self.merged += other.merged
+        self.dropped += other.dropped
+        self.failed += other.failed
+        self.latency.merge(other.latency)
+        self.fades += other.fades
+        self.fades_cancelled += other.fades_cancelled
+        self.held += other.held
+        self.flushed += other.flushed
+        self.confirmed += other.confirmed
+        self.unconfirmed += other.unconfirmed
+        self.confirm_latency.merge(other.confirm_latency)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the counters as a dict."""
+        return {
+            "sent": self.sent,
+            "skipped": self.skipped,
+            "merged": self.merged,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "latency": self.latency.as_dict(),
+            "fades": self.fades,
+            "fades_cancelled": self.fades_cancelled,
+            "held": self.held,
+            "flushed": self.flushed,
+            "confirmed": self.confirmed,
+            "unconfirmed": self.unconfirmed,
+            "confirm_latency": self.confirm_latency.as_dict(),
+        }
+
+
+class EntryStats:
+    """Counters of the commands made through the entities of a config entry."""
+
+    __slots__ = (
+        "last_sync",
+        "mirrored",
+        "reconciled",
+        "switch_toggles",
+        "syncs",
+        "turn_off",
+        "turn_on",
+    )
+
+    def __init__(self) -> None:
+        """Initialize the counters."""
+        self.turn_on = 0
+        self.turn_off = 0
+        self.syncs = 0
+        self.switch_toggles = 0
+        self.mirrored = 0
+        self.reconciled = 0
+        self.last_sync: datetime | None = None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the counters as a dict."""
+        return {
+            "turn_on": self.turn_on,
+            "turn_off": self.turn_off,
+            "syncs": self.syncs,
+            "switch_toggles": self.switch_toggles,
+            "mirrored": self.mirrored,
+            "reconciled": self.reconciled,
+            "last_sync": self.last_sync.isoformat() if self.last_sync else None,
+        }
@@ -5,50 +5,100 @@ from __future__ import annotations
 from typing import Any
 
 from homeassistant.components.switch import SwitchEntity
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.device import async_entity_id_to_device
+from homeassistant.const import STATE_ON
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.restore_state import RestoreEntity
+from homeassistant.util import dt as dt_util, slugify
 
-from .const import CONF_SOURCE_ENTITY_ID, SUFFIX_OVERRIDDEN
+from .const import ATTR_EXPIRES_AT, LAYER_OVERRIDE, SUFFIX_ACTIVE, SUFFIX_OVERRIDDEN
+from .coordinator import MitmiliConfigEntry
 
 
 async def async_setup_entry(
     hass: HomeAssistant,
-    entry: ConfigEntry,
+    entry: MitmiliConfigEntry,
     async_add_entities: AddEntitiesCallback,
 ) -> None:
-    """Set up Man in the Middle Light switch."""
-    source_entity_id = entry.options.get(CONF_SOURCE_ENTITY_ID) or entry.data.get(
-        CONF_SOURCE_ENTITY_ID
+    """Set up Man in the Middle Light switches."""
+    # The overridden switch enables the override layer, every additional layer
+    # has a switch of its own
+    async_add_entities(
+        ProxyOverriddenSwitch(hass, entry, layer)
+        for layer in range(LAYER_OVERRIDE, len(entry.runtime_data.switches))
     )
-    overridden_switch = ProxyOverriddenSwitch(hass, entry, source_entity_id)
-    async_add_entities([overridden_switch])
 
 
-class ProxyOverriddenSwitch(SwitchEntity):
-    """Representation of the overridden switch for Man in the Middle Light."""
+class ProxyOverriddenSwitch(RestoreEntity, SwitchEntity):
+    """Representation of a switch enabling a layer of a Man in the Middle Light."""
 
     _attr_should_poll = False
 
     def __init__(
-        self, hass: HomeAssistant, entry: ConfigEntry, source_entity_id: str
+        self, hass: HomeAssistant, entry: MitmiliConfigEntry, layer: int
     ) -> None:
         """Initialize the switch."""
         self._entry = entry
-        self._attr_unique_id = f"{entry.entry_id}_{SUFFIX_OVERRIDDEN}"
-        self._attr_name = f"{entry.title} {SUFFIX_OVERRIDDEN}"
-        self._attr_is_on = False
+        self._coordinator = entry.runtime_data
+        self.layer = layer
+        if layer == LAYER_OVERRIDE:
+            self._attr_unique_id = f"{entry.entry_id}_{SUFFIX_OVERRIDDEN}"
+            self._attr_name = f"{entry.title} {SUFFIX_OVERRIDDEN}"
+        else:
+            name = self._coordinator.async_get_layer_suffix(layer)
+            self._attr_unique_id = (
+                f"{entry.entry_id}_layer_{slugify(name)}_{SUFFIX_ACTIVE}"
+            )
+            self._attr_name = f"{entry.title} {name} {SUFFIX_ACTIVE}"
 
         # Link this entity to the source entity's device
-        self.device_entry = async_entity_id_to_device(hass, source_entity_id)
+        self.device_entry = self._coordinator.device
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Return when a timed override ends."""
+        if self.layer != LAYER_OVERRIDE:
+            return None
+        expires = self._coordinator.override_expires
+        return {ATTR_EXPIRES_AT: expires.isoformat() if expires else None}
+
+    @property
+    def is_on(self) -> bool:
+        """Return if the layer is enabled."""
+        return self._coordinator.is_layer_enabled(self.layer)
+
+    async def async_added_to_hass(self) -> None:
+        """Restore if the layer is enabled and register with the coordinator."""
+        await super().async_added_to_hass()
+
+        # Restoring the layer does not sync its light, the coordinator checks
+        # the source light when the entry is released
+        if (last_state := await self.async_get_last_state()) is not None:
+            enabled = last_state.state == STATE_ON
+            self._coordinator.async_restore_layer(self.layer, enabled)
+
+            # A timed override that ended while stopped is reverted right away
+            if (
+                enabled
+                and self.layer == LAYER_OVERRIDE
+                and (expires := last_state.attributes.get(ATTR_EXPIRES_AT))
+                and (expires_at := dt_util.parse_datetime(expires)) is not None
+            ):
+                self._coordinator.async_set_override_expiry(expires_at)
+
+        self._coordinator.switches[self.layer] = self
+        self.async_on_remove(self._async_unregister)
+
+    @callback
+    def _async_unregister(self) -> None:
+        """Unregister the switch from the coordinator."""
+        if self._coordinator.switches[self.layer] is self:
+            self._coordinator.switches[self.layer] = None
 
     async def async_turn_on(self, **kwargs: Any) -> None:
         """Turn on the switch."""
-        self._attr_is_on = True
-        self.async_write_ha_state()
+        self._coordinator.async_set_layer_enabled(self.layer, True)
 
     async def async_turn_off(self, **kwargs: Any) -> None:
         """Turn off the switch."""
-        self._attr_is_on = False
-        self.async_write_ha_state()
\ No newline at end of file
+        self._coordinator.async_set_layer_enabled(self.layer, False)
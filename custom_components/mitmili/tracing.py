@@ -0,0 +1,199 @@
+"""Latency tracing of the commands sent to source lights."""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+import logging
+import time
+from typing import Any
+
+from homeassistant.const import EVENT_STATE_CHANGED
+from homeassistant.core import (
+    CALLBACK_TYPE,
+    Context,
+    Event,
+    EventStateChangedData,
+    HomeAssistant,
+    callback,
+)
+
+from .const import EVENT_COMMAND_TRACED
+from .pipeline import SourceCommandPipeline, diff_against_state
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class _Trace:
+    """A call waiting for its source lights to report the requested state."""
+
+    context_id: str
+    pipeline: SourceCommandPipeline
+    service: str
+    data: dict[str, Any]
+    started: float
+    deadline: float
+    pending: set[str]
+    context_matched: bool = False
+
+
+class CommandTracer:
+    """Measure how long it takes until source lights confirm a command.
+
+    A command counts as confirmed once every source light it targets reports
+    a state with the requested values. Calls are sent with their own context,
+    which shows whether the state change was caused by the call itself. Source
+    lights that do not pass the context on are still matched by their values.
+
+    A single state listener serves all traces, and is only registered while
+    there are any. All traces have the same timeout, so they expire in the
+    order they were started and only the oldest one needs a timer.
+    """
+
+    def __init__(self, hass: HomeAssistant, timeout: float) -> None:
+        """Initialize the tracer."""
+        self.hass = hass
+        self._timeout = timeout
+        # By context ID and pipeline, in the order the traces were started.
+        # Pipelines merged into one call by the batcher share its context
+        self._traces: dict[tuple[str, str], _Trace] = {}
+        # The latest trace of every source light
+        self._by_entity: dict[str, _Trace] = {}
+        self._unsub_listener: CALLBACK_TYPE | None = None
+        self._timer: asyncio.TimerHandle | None = None
+
+    @callback
+    def async_start(
+        self,
+        pipeline: SourceCommandPipeline,
+        context: Context,
+        service: str,
+        data: dict[str, Any],
+        started: float,
+    ) -> None:
+        """Start tracing a call, started is when its command was submitted."""
+        trace = _Trace(
+            context_id=context.id,
+            pipeline=pipeline,
+            service=service,
+            data=data,
+            started=started,
+            deadline=time.monotonic() + self._timeout,
+            pending=set(pipeline.entity_ids),
+        )
+        for entity_id in pipeline.entity_ids:
+            # A newer command supersedes the trace of an older one
+            if (previous := self._by_entity.get(entity_id)) is not None:
+                self._async_discard(previous)
+            self._by_entity[entity_id] = trace
+        self._traces[trace.context_id, pipeline.key] = trace
+
+        if self._unsub_listener is None:
+            self._unsub_listener = self.hass.bus.async_listen(
+                EVENT_STATE_CHANGED,
+                self._async_state_changed,
+                event_filter=self._async_filter_state_changed,
+            )
+        if self._timer is None:
+            self._timer = self.hass.loop.call_later(
+                self._timeout, self._async_expire
+            )
+
+    @callback
+    def _async_filter_state_changed(self, event_data: EventStateChangedData) -> bool:
+        """Return if a state change is of a traced source light."""
+        return event_data["entity_id"] in self._by_entity
+
+    @callback
+    def _async_state_changed(self, event: Event[EventStateChangedData]) -> None:
+        """Confirm a source light once it reports the requested state."""
+        entity_id = event.data["entity_id"]
+        new_state = event.data["new_state"]
+        if (trace := self._by_entity.get(entity_id)) is None or new_state is None:
+            return
+        if diff_against_state(trace.service, trace.data, new_state) is not None:
+            return
+
+        context = new_state.context
+        if trace.context_id in (context.id, context.parent_id):
+            trace.context_matched = True
+        trace.pending.discard(entity_id)
+        del self._by_entity[entity_id]
+        if not trace.pending:
+            self._async_finish(trace, confirmed=True)
+
+    @callback
+    def _async_expire(self) -> None:
+        """Report the traces that were not confirmed in time."""
+        self._timer = None
+        now = time.monotonic()
+        while self._traces:
+            trace = next(iter(self._traces.values()))
+            if trace.deadline > now:
+                self._timer = self.hass.loop.call_later(
+                    trace.deadline - now, self._async_expire
+                )
+                return
+            self._async_finish(trace, confirmed=False)
+
+    @callback
+    def _async_discard(self, trace: _Trace) -> None:
+        """Stop tracing a call without reporting it."""
+        key = (trace.context_id, trace.pipeline.key)
+        if self._traces.get(key) is trace:
+            del self._traces[key]
+        for entity_id in trace.pending:
+            if self._by_entity.get(entity_id) is trace:
+                del self._by_entity[entity_id]
+        if not self._traces:
+            self._async_stop()
+
+    @callback
+    def _async_finish(self, trace: _Trace, confirmed: bool) -> None:
+        """Record and report the outcome of a trace."""
+        self._async_discard(trace)
+        stats = trace.pipeline.stats
+        latency: float | None = None
+        if confirmed:
+            latency = time.monotonic() - trace.started
+            stats.confirmed += 1
+            stats.confirm_latency.record(latency)
+        else:
+            stats.unconfirmed += 1
+            _LOGGER.debug(
+                "light.%s for %s not confirmed by %s within %s seconds",
+                trace.service,
+                trace.pipeline.key,
+                sorted(trace.pending),
+                self._timeout,
+            )
+
+        self.hass.bus.async_fire(
+            EVENT_COMMAND_TRACED,
+            {
+                "entity_ids": list(trace.pipeline.entity_ids),
+                "service": trace.service,
+                "confirmed": confirmed,
+                "latency": latency,
+                "context_matched": trace.context_matched,
+                "unconfirmed_entity_ids": sorted(trace.pending),
+            },
+        )
+
+    @callback
+    def _async_stop(self) -> None:
+        """Stop listening while there is nothing to trace."""
+        if self._unsub_listener is not None:
+            self._unsub_listener()
+            self._unsub_listener = None
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Stop tracing."""
+        self._traces.clear()
+        self._by_entity.clear()
+        self._async_stop()
@@ -0,0 +1,156 @@
+"""WebSocket API of the Man in the Middle Light integration."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.const import STATE_OFF, STATE_ON
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DATA_MITMILI
+from .coordinator import MitmiliCoordinator
+from .light_state import LightState
+
+# Seconds to collect changes before they are pushed as one message
+_DELTA_WINDOW = 0.1
+
+
+@callback
+def async_setup_websocket_api(hass: HomeAssistant) -> None:
+    """Register the websocket commands."""
+    websocket_api.async_register_command(hass, websocket_snapshot)
+    websocket_api.async_register_command(hass, websocket_subscribe)
+
+
+@callback
+def _async_entry_snapshot(coordinator: MitmiliCoordinator) -> dict[str, Any]:
+    """Return the state of an entry as a JSON serializable dict.
+
+    The desired state is that of the active light, the actual state that of
+    each source light, None while it is unavailable.
+    """
+    hass = coordinator.hass
+    actual: dict[str, dict[str, Any] | None] = {}
+    for entity_id in coordinator.source_entity_ids:
+        state = hass.states.get(entity_id)
+        actual[entity_id] = (
+            LightState().mirror(state).as_dict()
+            if state is not None and state.state in (STATE_ON, STATE_OFF)
+            else None
+        )
+    light = coordinator.active_light
+    return {
+        "title": coordinator.entry.title,
+        "lights": [
+            light.entity_id if light is not None else None
+            for light in coordinator.lights
+        ],
+        "switches": [
+            switch.entity_id if switch is not None else None
+            for switch in coordinator.switches
+        ],
+        "active_layer": coordinator.active_layer,
+        "overridden": coordinator.overridden,
+        "override_expires": (
+            coordinator.override_expires.isoformat()
+            if coordinator.override_expires
+            else None
+        ),
+        "desired": light.light_state.as_dict() if light is not None else None,
+        "actual": actual,
+        "in_sync": (
+            not coordinator.async_source_differs(light)
+            if light is not None
+            else None
+        ),
+    }
+
+
+@callback
+def _async_snapshot(hass: HomeAssistant) -> dict[str, dict[str, Any]]:
+    """Return the state of all loaded entries, by entry ID."""
+    return {
+        entry_id: _async_entry_snapshot(coordinator)
+        for entry_id, coordinator in hass.data[DATA_MITMILI].coordinators.items()
+    }
+
+
+@websocket_api.websocket_command({vol.Required("type"): "mitmili/snapshot"})
+@callback
+def websocket_snapshot(
+    hass: HomeAssistant,
+    connection: websocket_api.ActiveConnection,
+    msg: dict[str, Any],
+) -> None:
+    """Return the state of all entries in one message."""
+    connection.send_result(msg["id"], {"entries": _async_snapshot(hass)})
+
+
+@websocket_api.websocket_command({vol.Required("type"): "mitmili/subscribe"})
+@callback
+def websocket_subscribe(
+    hass: HomeAssistant,
+    connection: websocket_api.ActiveConnection,
+    msg: dict[str, Any],
+) -> None:
+    """Push the state of all entries, and after that only the changes.
+
+    Changes are collected for a short while and pushed as one message, with
+    the entries that changed and those that were removed.
+    """
+    data = hass.data[DATA_MITMILI]
+    msg_id: int = msg["id"]
+    sent = _async_snapshot(hass)
+    changed: set[str] = set()
+    timer: asyncio.TimerHandle | None = None
+
+    @callback
+    def _async_push() -> None:
+        """Push the entries that changed since the last message."""
+        nonlocal timer
+        timer = None
+        updated: dict[str, dict[str, Any]] = {}
+        removed: list[str] = []
+        for entry_id in changed:
+            if (coordinator := data.coordinators.get(entry_id)) is None:
+                if sent.pop(entry_id, None) is not None:
+                    removed.append(entry_id)
+                continue
+            snapshot = _async_entry_snapshot(coordinator)
+            # Changes that cancel each other out are not pushed
+            if sent.get(entry_id) != snapshot:
+                sent[entry_id] = updated[entry_id] = snapshot
+        changed.clear()
+        if updated or removed:
+            connection.send_message(
+                websocket_api.event_message(
+                    msg_id, {"changed": updated, "removed": removed}
+                )
+            )
+
+    @callback
+    def _async_entry_changed(entry_id: str) -> None:
+        """Collect a change, and push it with the others that follow."""
+        nonlocal timer
+        changed.add(entry_id)
+        if timer is None:
+            timer = hass.loop.call_later(_DELTA_WINDOW, _async_push)
+
+    unsub_listener = data.async_add_listener(_async_entry_changed)
+
+    @callback
+    def _async_unsubscribe() -> None:
+        """Stop pushing changes."""
+        unsub_listener()
+        if timer is not None:
+            timer.cancel()
+
+    connection.subscriptions[msg_id] = _async_unsubscribe
+    connection.send_result(msg_id)
+    connection.send_message(
+        websocket_api.event_message(msg_id, {"changed": dict(sent), "removed": []})
+    )
@@ -0,0 +1 @@
+"""Tests for the Man in the Middle Light integration."""
@@ -0,0 +1,166 @@
+"""Fixtures for the Man in the Middle Light tests."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Generator
+from typing import Any
+
+import pytest
+
+from homeassistant.components.light import ATTR_BRIGHTNESS, ColorMode, LightEntity
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType
+from homeassistant.setup import async_setup_component
+
+from custom_components.mitmili.const import (
+    CONF_SOURCE_ENTITY_ID,
+    DOMAIN,
+    SUFFIX_PROXY,
+)
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    MockModule,
+    MockPlatform,
+    mock_integration,
+    mock_platform,
+)
+
+SOURCE_DOMAIN = "test_source"
+SOURCE_ENTITY_ID = "light.source"
+
+
+class MockSourceLight(LightEntity):
+    """Source light that applies commands instantly and counts them."""
+
+    _attr_should_poll = False
+    _attr_supported_color_modes = {ColorMode.BRIGHTNESS}
+    _attr_color_mode = ColorMode.BRIGHTNESS
+
+    def __init__(self, object_id: str = "source") -> None:
+        """Initialize the light."""
+        self.entity_id = f"light.{object_id}"
+        self._attr_name = object_id.capitalize()
+        self._attr_unique_id = object_id
+        self._attr_is_on = False
+        self.calls = 0
+        # Raised by every call, if set
+        self.error: Exception | None = None
+        # Seconds every call takes
+        self.delay = 0.0
+
+    async def _async_handle_call(self) -> None:
+        """Count a call, and make it slow or fail if requested."""
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+
+    async def async_turn_on(self, **kwargs: Any) -> None:
+        """Turn on the light."""
+        await self._async_handle_call()
+        self._attr_is_on = True
+        if ATTR_BRIGHTNESS in kwargs:
+            self._attr_brightness = kwargs[ATTR_BRIGHTNESS]
+        self.async_write_ha_state()
+
+    async def async_turn_off(self, **kwargs: Any) -> None:
+        """Turn off the light."""
+        await self._async_handle_call()
+        self._attr_is_on = False
+        self.async_write_ha_state()
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(
+    enable_custom_integrations: None,
+) -> Generator[None]:
+    """Enable loading the integration from custom_components."""
+    yield
+
+
+async def async_setup_source_lights(
+    hass: HomeAssistant, lights: list[MockSourceLight]
+) -> None:
+    """Set up source lights."""
+
+    async def async_setup_platform(
+        hass: HomeAssistant,
+        config: ConfigType,
+        async_add_entities: AddEntitiesCallback,
+        discovery_info: DiscoveryInfoType | None = None,
+    ) -> None:
+        async_add_entities(lights)
+
+    mock_integration(hass, MockModule(SOURCE_DOMAIN))
+    mock_platform(
+        hass,
+        f"{SOURCE_DOMAIN}.light",
+        MockPlatform(async_setup_platform=async_setup_platform),
+    )
+    assert await async_setup_component(
+        hass, "light", {"light": {"platform": SOURCE_DOMAIN}}
+    )
+    await hass.async_block_till_done()
+
+
+@pytest.fixture
+async def source_light(hass: HomeAssistant) -> MockSourceLight:
+    """Set up a source light, return the entity."""
+    light = MockSourceLight()
+    await async_setup_source_lights(hass, [light])
+    return light
+
+
+@pytest.fixture
+async def mitmili_entry(
+    hass: HomeAssistant, source_light: MockSourceLight
+) -> MockConfigEntry:
+    """Set up an entry for the source light, return the entry."""
+    entry = MockConfigEntry(
+        domain=DOMAIN, title="Source", options={CONF_SOURCE_ENTITY_ID: SOURCE_ENTITY_ID}
+    )
+    entry.add_to_hass(hass)
+    assert await async_setup_component(hass, DOMAIN, {})
+    await hass.async_block_till_done(wait_background_tasks=True)
+    return entry
+
+
+async def async_setup_entries(
+    hass: HomeAssistant,
+    lights: list[MockSourceLight],
+    config: ConfigType | None = None,
+) -> list[MockConfigEntry]:
+    """Set up source lights and an entry for each, return the entries."""
+    await async_setup_source_lights(hass, lights)
+    entries = []
+    for light in lights:
+        entry = MockConfigEntry(
+            domain=DOMAIN,
+            title=light.name,
+            options={CONF_SOURCE_ENTITY_ID: light.entity_id},
+        )
+        entry.add_to_hass(hass)
+        entries.append(entry)
+    assert await async_setup_component(hass, DOMAIN, {DOMAIN: config or {}})
+    await hass.async_block_till_done(wait_background_tasks=True)
+    return entries
+
+
+def get_entity_id(
+    hass: HomeAssistant, entry: MockConfigEntry, domain: str, suffix: str
+) -> str:
+    """Return the entity ID of an entity of an entry."""
+    entity_id = er.async_get(hass).async_get_entity_id(
+        domain, DOMAIN, f"{entry.entry_id}_{suffix}"
+    )
+    assert entity_id is not None
+    return entity_id
+
+
+def get_proxy_entity_id(hass: HomeAssistant, entry: MockConfigEntry) -> str:
+    """Return the entity ID of the proxy light of an entry."""
+    return get_entity_id(hass, entry, "light", SUFFIX_PROXY)
@@ -0,0 +1,67 @@
+"""Tests for the call batcher of the Man in the Middle Light integration."""
+
+from __future__ import annotations
+
+from unittest.mock import patch
+
+import pytest
+
+from homeassistant.components.light import ATTR_BRIGHTNESS
+from homeassistant.const import ATTR_ENTITY_ID, SERVICE_TURN_ON, STATE_ON
+from homeassistant.core import HomeAssistant
+
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from .conftest import SOURCE_ENTITY_ID, MockSourceLight, get_proxy_entity_id
+
+
+async def _async_turn_on(hass: HomeAssistant, entity_id: str, brightness: int) -> None:
+    """Turn on a light and wait for the command to reach the source light."""
+    await hass.services.async_call(
+        "light",
+        SERVICE_TURN_ON,
+        {ATTR_ENTITY_ID: entity_id, ATTR_BRIGHTNESS: brightness},
+        blocking=True,
+    )
+    await hass.async_block_till_done(wait_background_tasks=True)
+
+
+async def test_unexpected_error_counts_as_failure(
+    hass: HomeAssistant,
+    source_light: MockSourceLight,
+    mitmili_entry: MockConfigEntry,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    """Test an error that is not a Home Assistant error fails only its call."""
+    proxy_entity_id = get_proxy_entity_id(hass, mitmili_entry)
+    stats = mitmili_entry.runtime_data.pipeline.stats
+
+    source_light.error = ValueError("Invalid brightness")
+    await _async_turn_on(hass, proxy_entity_id, 100)
+    assert stats.failed == 1
+    assert "Error calling light.turn_on" in caplog.text
+
+    source_light.error = None
+    await _async_turn_on(hass, proxy_entity_id, 120)
+    assert stats.failed == 1
+    state = hass.states.get(SOURCE_ENTITY_ID)
+    assert state.state == STATE_ON
+    assert state.attributes[ATTR_BRIGHTNESS] == 120
+
+
+async def test_call_timeout(
+    hass: HomeAssistant,
+    source_light: MockSourceLight,
+    mitmili_entry: MockConfigEntry,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    """Test a call that takes too long counts as failed."""
+    proxy_entity_id = get_proxy_entity_id(hass, mitmili_entry)
+    stats = mitmili_entry.runtime_data.pipeline.stats
+
+    source_light.delay = 1
+    with patch("custom_components.mitmili.batcher._CALL_TIMEOUT", 0.01):
+        await _async_turn_on(hass, proxy_entity_id, 100)
+    assert stats.failed == 1
+    assert "Timeout calling light.turn_on" in caplog.text
+    assert stats.latency.as_dict()["count"] == 0
@@ -0,0 +1,59 @@
+"""Tests for the config flow of the Man in the Middle Light integration."""
+
+from __future__ import annotations
+
+from homeassistant.config_entries import SOURCE_USER
+from homeassistant.const import STATE_OFF
+from homeassistant.core import HomeAssistant
+from homeassistant.data_entry_flow import FlowResultType
+
+from custom_components.mitmili.const import CONF_SOURCE_ENTITY_ID, DOMAIN
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+
+async def test_user_rejects_overlapping_sources(hass: HomeAssistant) -> None:
+    """Test a light that another entry controls cannot be added again."""
+    for entity_id in ("light.a", "light.b", "light.c"):
+        hass.states.async_set(entity_id, STATE_OFF)
+    MockConfigEntry(
+        domain=DOMAIN, options={CONF_SOURCE_ENTITY_ID: ["light.a", "light.b"]}
+    ).add_to_hass(hass)
+
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN, context={"source": SOURCE_USER}
+    )
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"], {CONF_SOURCE_ENTITY_ID: ["light.b", "light.c"]}
+    )
+    assert result["type"] is FlowResultType.FORM
+    assert result["errors"] == {"base": "source_in_use"}
+
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"], {CONF_SOURCE_ENTITY_ID: ["light.c"]}
+    )
+    assert result["type"] is FlowResultType.CREATE_ENTRY
+
+
+async def test_options_reject_overlapping_sources(hass: HomeAssistant) -> None:
+    """Test the options cannot add a light that another entry controls."""
+    for entity_id in ("light.a", "light.b", "light.c"):
+        hass.states.async_set(entity_id, STATE_OFF)
+    MockConfigEntry(
+        domain=DOMAIN, options={CONF_SOURCE_ENTITY_ID: ["light.a"]}
+    ).add_to_hass(hass)
+    entry = MockConfigEntry(domain=DOMAIN, options={CONF_SOURCE_ENTITY_ID: ["light.b"]})
+    entry.add_to_hass(hass)
+
+    result = await hass.config_entries.options.async_init(entry.entry_id)
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {CONF_SOURCE_ENTITY_ID: ["light.a", "light.b"]}
+    )
+    assert result["type"] is FlowResultType.FORM
+    assert result["errors"] == {"base": "source_in_use"}
+
+    # The lights of the entry itself are not in use by another entry
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {CONF_SOURCE_ENTITY_ID: ["light.b", "light.c"]}
+    )
+    assert result["type"] is FlowResultType.CREATE_ENTRY
+    assert entry.options[CONF_SOURCE_ENTITY_ID] == ["light.b", "light.c"]
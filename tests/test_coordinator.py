@@ -0,0 +1,44 @@
+"""Tests for the coordinator of the Man in the Middle Light integration."""
+
+from __future__ import annotations
+
+from homeassistant.const import STATE_OFF
+from homeassistant.core import HomeAssistant
+
+from custom_components.mitmili.const import (
+    CONF_LAYERS,
+    CONF_SOURCE_ENTITY_ID,
+    DATA_MITMILI,
+    DOMAIN,
+)
+from custom_components.mitmili.coordinator import get_layers
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from .conftest import SOURCE_ENTITY_ID, MockSourceLight
+
+
+def test_layers_with_the_same_slug() -> None:
+    """Test only the first of the layers with the same unique ID is used."""
+    entry = MockConfigEntry(
+        domain=DOMAIN, options={CONF_LAYERS: ["Movie", " movie", "Party", "", "MOVIE"]}
+    )
+    assert get_layers(entry) == ("Movie", "Party")
+
+
+async def test_switching_source_releases_pipeline(
+    hass: HomeAssistant, source_light: MockSourceLight, mitmili_entry: MockConfigEntry
+) -> None:
+    """Test the pipeline of the previous source light is dropped."""
+    hass.states.async_set("light.other", STATE_OFF)
+    data = hass.data[DATA_MITMILI]
+    previous = mitmili_entry.runtime_data.pipeline
+    assert list(data.pipelines) == [SOURCE_ENTITY_ID]
+
+    hass.config_entries.async_update_entry(
+        mitmili_entry, options={CONF_SOURCE_ENTITY_ID: ["light.other"]}
+    )
+    await hass.async_block_till_done(wait_background_tasks=True)
+
+    assert mitmili_entry.runtime_data.pipeline is not previous
+    assert list(data.pipelines) == ["light.other"]
+    assert not previous.busy
@@ -0,0 +1,96 @@
+"""Tests for the timed overrides of the Man in the Middle Light integration."""
+
+from __future__ import annotations
+
+from datetime import timedelta
+
+from freezegun.api import FrozenDateTimeFactory
+
+from homeassistant.const import ATTR_CONFIG_ENTRY_ID, STATE_ON
+from homeassistant.core import HomeAssistant, State
+from homeassistant.util import dt as dt_util
+
+from custom_components.mitmili.const import (
+    ATTR_DURATION,
+    ATTR_EXPIRES_AT,
+    ATTR_OVERRIDDEN,
+    DATA_MITMILI,
+    DOMAIN,
+    SERVICE_SET_OVERRIDDEN,
+)
+from pytest_homeassistant_custom_component.common import (
+    async_fire_time_changed,
+    mock_restore_cache,
+)
+
+from .conftest import MockSourceLight, async_setup_entries
+
+
+async def test_timed_override(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory
+) -> None:
+    """Test timed overrides are reverted when they end, and can be rescheduled."""
+    entries = await async_setup_entries(
+        hass, [MockSourceLight("first"), MockSourceLight("second")]
+    )
+    expiry = hass.data[DATA_MITMILI].expiry
+    await hass.services.async_call(
+        DOMAIN,
+        SERVICE_SET_OVERRIDDEN,
+        {
+            ATTR_OVERRIDDEN: True,
+            ATTR_DURATION: timedelta(hours=1),
+            ATTR_CONFIG_ENTRY_ID: [entry.entry_id for entry in entries],
+        },
+        blocking=True,
+    )
+    await hass.services.async_call(
+        DOMAIN,
+        SERVICE_SET_OVERRIDDEN,
+        {
+            ATTR_OVERRIDDEN: True,
+            ATTR_DURATION: timedelta(hours=2),
+            ATTR_CONFIG_ENTRY_ID: entries[1].entry_id,
+        },
+        blocking=True,
+    )
+    assert len(expiry) == 2
+
+    freezer.tick(timedelta(hours=1))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done(wait_background_tasks=True)
+    assert [entry.runtime_data.overridden for entry in entries] == [False, True]
+    assert expiry.expired == 1
+
+    freezer.tick(timedelta(hours=1))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done(wait_background_tasks=True)
+    assert [entry.runtime_data.overridden for entry in entries] == [False, False]
+    assert expiry.expired == 2
+    assert len(expiry) == 0
+
+
+async def test_timed_override_restored(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory
+) -> None:
+    """Test the end of a timed override survives a restart."""
+    expires = dt_util.utcnow() + timedelta(minutes=5)
+    mock_restore_cache(
+        hass,
+        [
+            State(
+                "switch.first_overridden",
+                STATE_ON,
+                {ATTR_EXPIRES_AT: expires.isoformat()},
+            )
+        ],
+    )
+    (entry,) = await async_setup_entries(hass, [MockSourceLight("first")])
+    assert entry.runtime_data.overridden
+    assert entry.runtime_data.override_expires == expires
+
+    freezer.tick(timedelta(minutes=5))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done(wait_background_tasks=True)
+    assert not entry.runtime_data.overridden
+    assert hass.data[DATA_MITMILI].expiry.expired == 1
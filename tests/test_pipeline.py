@@ -0,0 +1,173 @@
+"""Tests for the command pipeline of the Man in the Middle Light integration."""
+
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import patch
+
+from homeassistant.components.light import ATTR_BRIGHTNESS
+from homeassistant.const import (
+    ATTR_ENTITY_ID,
+    SERVICE_TURN_OFF,
+    SERVICE_TURN_ON,
+    STATE_ON,
+)
+from homeassistant.core import HomeAssistant
+
+from custom_components.mitmili.const import (
+    CONF_CROSSFADE,
+    CONF_MIRROR_SOURCE,
+    CONF_SOURCE_ENTITY_ID,
+    DATA_MITMILI,
+    SUFFIX_OVERRIDDEN,
+    SUFFIX_OVERRIDE,
+)
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from .conftest import (
+    SOURCE_ENTITY_ID,
+    MockSourceLight,
+    get_entity_id,
+    get_proxy_entity_id,
+)
+
+
+async def test_command_after_skipped_command(
+    hass: HomeAssistant, source_light: MockSourceLight, mitmili_entry: MockConfigEntry
+) -> None:
+    """Test a command is sent after the previous one was skipped."""
+    proxy_entity_id = get_proxy_entity_id(hass, mitmili_entry)
+
+    # The source light is off already, so the command is skipped
+    await hass.services.async_call(
+        "light", SERVICE_TURN_OFF, {ATTR_ENTITY_ID: proxy_entity_id}, blocking=True
+    )
+    await hass.async_block_till_done(wait_background_tasks=True)
+    assert source_light.calls == 0
+
+    await hass.services.async_call(
+        "light",
+        SERVICE_TURN_ON,
+        {ATTR_ENTITY_ID: proxy_entity_id, ATTR_BRIGHTNESS: 100},
+        blocking=True,
+    )
+    await hass.async_block_till_done(wait_background_tasks=True)
+    assert source_light.calls == 1
+    state = hass.states.get(SOURCE_ENTITY_ID)
+    assert state.state == STATE_ON
+    assert state.attributes[ATTR_BRIGHTNESS] == 100
+
+
+async def test_command_during_fade(
+    hass: HomeAssistant, source_light: MockSourceLight, mitmili_entry: MockConfigEntry
+) -> None:
+    """Test a command made during a fade is applied to the state faded to."""
+    hass.config_entries.async_update_entry(
+        mitmili_entry,
+        options={CONF_SOURCE_ENTITY_ID: SOURCE_ENTITY_ID, CONF_CROSSFADE: 10},
+    )
+    # Two frames, five seconds apart
+    hass.data[DATA_MITMILI].fade_frame_rate = 0.2
+    override_entity_id = get_entity_id(hass, mitmili_entry, "light", SUFFIX_OVERRIDE)
+    await hass.services.async_call(
+        "light",
+        SERVICE_TURN_ON,
+        {ATTR_ENTITY_ID: get_proxy_entity_id(hass, mitmili_entry), ATTR_BRIGHTNESS: 20},
+        blocking=True,
+    )
+    await hass.services.async_call(
+        "light",
+        SERVICE_TURN_ON,
+        {ATTR_ENTITY_ID: override_entity_id, ATTR_BRIGHTNESS: 250},
+        blocking=True,
+    )
+    await hass.async_block_till_done(wait_background_tasks=True)
+    assert hass.states.get(SOURCE_ENTITY_ID).attributes[ATTR_BRIGHTNESS] == 20
+
+    # The fade sends the brightness half way right away, and 250 after a while
+    await hass.services.async_call(
+        "switch",
+        SERVICE_TURN_ON,
+        {
+            ATTR_ENTITY_ID: get_entity_id(
+                hass, mitmili_entry, "switch", SUFFIX_OVERRIDDEN
+            )
+        },
+        blocking=True,
+    )
+    await asyncio.sleep(0.1)
+    await hass.async_block_till_done()
+    assert hass.states.get(SOURCE_ENTITY_ID).attributes[ATTR_BRIGHTNESS] == 135
+
+    await hass.services.async_call(
+        "light", SERVICE_TURN_ON, {ATTR_ENTITY_ID: override_entity_id}, blocking=True
+    )
+    await hass.async_block_till_done(wait_background_tasks=True)
+    assert mitmili_entry.runtime_data.pipeline.stats.fades_cancelled == 1
+    assert hass.states.get(SOURCE_ENTITY_ID).attributes[ATTR_BRIGHTNESS] == 250
+
+
+async def test_source_back_while_command_held(
+    hass: HomeAssistant, source_light: MockSourceLight, mitmili_entry: MockConfigEntry
+) -> None:
+    """Test a source light coming back is not mirrored over a held command."""
+    hass.config_entries.async_update_entry(
+        mitmili_entry,
+        options={CONF_SOURCE_ENTITY_ID: SOURCE_ENTITY_ID, CONF_MIRROR_SOURCE: True},
+    )
+    proxy_entity_id = get_proxy_entity_id(hass, mitmili_entry)
+    source_light._attr_available = False
+    source_light.async_write_ha_state()
+
+    await hass.services.async_call(
+        "light",
+        SERVICE_TURN_ON,
+        {ATTR_ENTITY_ID: proxy_entity_id, ATTR_BRIGHTNESS: 100},
+        blocking=True,
+    )
+    await hass.async_block_till_done(wait_background_tasks=True)
+    assert source_light.calls == 0
+
+    with patch("custom_components.mitmili.pipeline.random.uniform", return_value=0):
+        source_light._attr_available = True
+        source_light._attr_is_on = True
+        source_light._attr_brightness = 200
+        source_light.async_write_ha_state()
+        await hass.async_block_till_done(wait_background_tasks=True)
+        # The held command is flushed from a timer
+        await asyncio.sleep(0)
+        await hass.async_block_till_done(wait_background_tasks=True)
+
+    assert source_light.calls == 1
+    assert hass.states.get(proxy_entity_id).attributes[ATTR_BRIGHTNESS] == 100
+    state = hass.states.get(SOURCE_ENTITY_ID)
+    assert state.state == STATE_ON
+    assert state.attributes[ATTR_BRIGHTNESS] == 100
+
+
+async def test_unloaded_entry_sends_no_held_command(
+    hass: HomeAssistant, source_light: MockSourceLight, mitmili_entry: MockConfigEntry
+) -> None:
+    """Test the command held for an unloaded entry is dropped with its pipeline."""
+    source_light._attr_available = False
+    source_light.async_write_ha_state()
+    await hass.services.async_call(
+        "light",
+        SERVICE_TURN_ON,
+        {
+            ATTR_ENTITY_ID: get_proxy_entity_id(hass, mitmili_entry),
+            ATTR_BRIGHTNESS: 100,
+        },
+        blocking=True,
+    )
+    await hass.async_block_till_done(wait_background_tasks=True)
+
+    assert await hass.config_entries.async_unload(mitmili_entry.entry_id)
+    assert hass.data[DATA_MITMILI].pipelines == {}
+
+    with patch("custom_components.mitmili.pipeline.random.uniform", return_value=0):
+        source_light._attr_available = True
+        source_light.async_write_ha_state()
+        await asyncio.sleep(0)
+        await hass.async_block_till_done(wait_background_tasks=True)
+    assert source_light.calls == 0
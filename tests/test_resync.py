@@ -0,0 +1,61 @@
+"""Tests for the staged resync of the Man in the Middle Light integration."""
+
+from __future__ import annotations
+
+from unittest.mock import patch
+
+from homeassistant.components.light import ATTR_BRIGHTNESS, ColorMode
+from homeassistant.const import STATE_ON
+from homeassistant.core import HomeAssistant, State
+from homeassistant.setup import async_setup_component
+
+from custom_components.mitmili.const import (
+    CONF_RESYNC_JITTER,
+    CONF_SOURCE_ENTITY_ID,
+    DOMAIN,
+)
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    mock_restore_cache_with_extra_data,
+)
+
+from .conftest import SOURCE_ENTITY_ID, MockSourceLight
+
+
+async def test_restored_state_sync_is_spread_out(
+    hass: HomeAssistant, source_light: MockSourceLight
+) -> None:
+    """Test syncing a restored state waits for the jitter like other syncs."""
+    mock_restore_cache_with_extra_data(
+        hass,
+        [
+            (
+                State("light.source_proxy", STATE_ON),
+                {
+                    "is_on": True,
+                    "brightness": 200,
+                    "color_mode": ColorMode.BRIGHTNESS,
+                    "color": None,
+                    "effect": None,
+                    "white": None,
+                },
+            )
+        ],
+    )
+    MockConfigEntry(
+        domain=DOMAIN, title="Source", options={CONF_SOURCE_ENTITY_ID: SOURCE_ENTITY_ID}
+    ).add_to_hass(hass)
+
+    with patch(
+        "custom_components.mitmili.resync.random.uniform", return_value=0
+    ) as uniform:
+        assert await async_setup_component(
+            hass, DOMAIN, {DOMAIN: {CONF_RESYNC_JITTER: 5}}
+        )
+        await hass.async_block_till_done(wait_background_tasks=True)
+
+    uniform.assert_called_once_with(0, 5)
+    assert source_light.calls == 1
+    state = hass.states.get(SOURCE_ENTITY_ID)
+    assert state.state == STATE_ON
+    assert state.attributes[ATTR_BRIGHTNESS] == 200
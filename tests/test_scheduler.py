@@ -0,0 +1,105 @@
+"""Tests for the command scheduler of the Man in the Middle Light integration."""
+
+from __future__ import annotations
+
+import asyncio
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.mitmili.scheduler import CommandPriority, CommandScheduler
+
+
+async def test_full_queue_keeps_latest_state(hass: HomeAssistant) -> None:
+    """Test a full queue only drops reconciliation commands."""
+    scheduler = CommandScheduler(hass, 20, {}, 2)
+    # Use up the burst, so the commands that follow have to wait
+    await asyncio.gather(
+        *(
+            scheduler.async_acquire(
+                f"light.burst_{index}", f"light.burst_{index}", CommandPriority.BULK
+            )
+            for index in range(20)
+        )
+    )
+    reconcile = hass.async_create_task(
+        scheduler.async_acquire(
+            "light.reconcile", "light.reconcile", CommandPriority.RECONCILE
+        )
+    )
+    await asyncio.sleep(0)
+    granted = await asyncio.gather(
+        *(
+            scheduler.async_acquire(
+                f"light.{index}", f"light.{index}", CommandPriority.BULK
+            )
+            for index in range(5)
+        )
+    )
+
+    assert all(granted)
+    assert await reconcile is False
+    assert scheduler.dropped == 1
+
+
+async def test_batched_commands_share_a_token(hass: HomeAssistant) -> None:
+    """Test commands sent in the same call take a single token."""
+    scheduler = CommandScheduler(hass, 1, {}, 100)
+    batched = [
+        hass.async_create_task(
+            scheduler.async_acquire(
+                f"light.{index}",
+                f"light.{index}",
+                CommandPriority.INTERACTIVE,
+                ("turn_on", (("brightness", 100),)),
+            )
+        )
+        for index in range(3)
+    ]
+    other = hass.async_create_task(
+        scheduler.async_acquire(
+            "light.other",
+            "light.other",
+            CommandPriority.INTERACTIVE,
+            ("turn_on", (("brightness", 200),)),
+        )
+    )
+
+    assert await asyncio.gather(*batched) == [True, True, True]
+    assert scheduler.batched == 2
+    # The other call waits for the next token
+    assert not other.done()
+    scheduler.async_shutdown()
+    assert await other is False
+
+
+async def test_interactive_commands_first(hass: HomeAssistant) -> None:
+    """Test waiting commands are granted by priority, then in order."""
+    scheduler = CommandScheduler(hass, 20, {}, 100)
+    # Use up the burst, so the commands that follow have to wait
+    await asyncio.gather(
+        *(
+            scheduler.async_acquire(
+                f"light.burst_{index}", f"light.burst_{index}", CommandPriority.BULK
+            )
+            for index in range(20)
+        )
+    )
+    granted: list[str] = []
+
+    async def acquire(key: str, priority: CommandPriority) -> None:
+        assert await scheduler.async_acquire(key, key, priority)
+        granted.append(key)
+
+    await asyncio.gather(
+        acquire("light.reconcile", CommandPriority.RECONCILE),
+        acquire("light.bulk_1", CommandPriority.BULK),
+        acquire("light.bulk_2", CommandPriority.BULK),
+        acquire("light.interactive", CommandPriority.INTERACTIVE),
+    )
+
+    assert granted == [
+        "light.interactive",
+        "light.bulk_1",
+        "light.bulk_2",
+        "light.reconcile",
+    ]
@@ -0,0 +1,70 @@
+"""Tests for the services of the Man in the Middle Light integration."""
+
+from __future__ import annotations
+
+from homeassistant.components.light import ATTR_BRIGHTNESS
+from homeassistant.const import (
+    ATTR_CONFIG_ENTRY_ID,
+    ATTR_ENTITY_ID,
+    SERVICE_TURN_ON,
+    STATE_OFF,
+    STATE_ON,
+)
+from homeassistant.core import HomeAssistant
+
+from custom_components.mitmili.const import (
+    ATTR_OVERRIDDEN,
+    DATA_MITMILI,
+    DOMAIN,
+    SERVICE_SET_OVERRIDDEN,
+    SUFFIX_OVERRIDDEN,
+)
+
+from .conftest import (
+    MockSourceLight,
+    async_setup_entries,
+    get_entity_id,
+    get_proxy_entity_id,
+)
+
+
+async def test_set_overridden(hass: HomeAssistant) -> None:
+    """Test entries targeted by entity and by entry ID are overridden together."""
+    lights = [MockSourceLight(name) for name in ("first", "second", "third")]
+    entries = await async_setup_entries(hass, lights)
+    await hass.services.async_call(
+        "light",
+        SERVICE_TURN_ON,
+        {
+            ATTR_ENTITY_ID: [get_proxy_entity_id(hass, entry) for entry in entries],
+            ATTR_BRIGHTNESS: 100,
+        },
+        blocking=True,
+    )
+    await hass.async_block_till_done(wait_background_tasks=True)
+    merged = hass.data[DATA_MITMILI].batcher.merged
+
+    await hass.services.async_call(
+        DOMAIN,
+        SERVICE_SET_OVERRIDDEN,
+        {
+            ATTR_OVERRIDDEN: True,
+            ATTR_ENTITY_ID: get_proxy_entity_id(hass, entries[0]),
+            ATTR_CONFIG_ENTRY_ID: entries[1].entry_id,
+        },
+        blocking=True,
+    )
+    await hass.async_block_till_done(wait_background_tasks=True)
+
+    assert [entry.runtime_data.overridden for entry in entries] == [True, True, False]
+    assert [
+        hass.states.get(get_entity_id(hass, entry, "switch", SUFFIX_OVERRIDDEN)).state
+        for entry in entries
+    ] == [STATE_ON, STATE_ON, STATE_OFF]
+    # The override lights are off, the two syncs are sent as one call
+    assert [hass.states.get(light.entity_id).state for light in lights] == [
+        STATE_OFF,
+        STATE_OFF,
+        STATE_ON,
+    ]
+    assert hass.data[DATA_MITMILI].batcher.merged == merged + 1
@@ -0,0 +1,79 @@
+"""Tests for the latency tracing of the Man in the Middle Light integration."""
+
+from __future__ import annotations
+
+import asyncio
+
+from homeassistant.components.light import ATTR_BRIGHTNESS
+from homeassistant.const import ATTR_ENTITY_ID, SERVICE_TURN_ON
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+
+from custom_components.mitmili.const import (
+    CONF_TRACE,
+    CONF_TRACE_TIMEOUT,
+    DATA_MITMILI,
+    EVENT_COMMAND_TRACED,
+)
+from pytest_homeassistant_custom_component.common import async_capture_events
+
+from .conftest import MockSourceLight, async_setup_entries, get_proxy_entity_id
+
+
+async def test_trace_calls_merged_into_one(hass: HomeAssistant) -> None:
+    """Test every source light of a merged call is traced on its own."""
+    entries = await async_setup_entries(
+        hass,
+        [MockSourceLight("first"), MockSourceLight("second")],
+        {CONF_TRACE: True},
+    )
+    events = async_capture_events(hass, EVENT_COMMAND_TRACED)
+
+    await hass.services.async_call(
+        "light",
+        SERVICE_TURN_ON,
+        {
+            ATTR_ENTITY_ID: [get_proxy_entity_id(hass, entry) for entry in entries],
+            ATTR_BRIGHTNESS: 100,
+        },
+        blocking=True,
+    )
+    await hass.async_block_till_done(wait_background_tasks=True)
+
+    assert hass.data[DATA_MITMILI].batcher.merged == 1
+    assert sorted(event.data["entity_ids"] for event in events) == [
+        ["light.first"],
+        ["light.second"],
+    ]
+    assert all(event.data["confirmed"] for event in events)
+    assert all(event.data["context_matched"] for event in events)
+    for entry in entries:
+        assert entry.runtime_data.pipeline.stats.confirmed == 1
+
+
+async def test_unconfirmed_call_reported(hass: HomeAssistant) -> None:
+    """Test a source light that does not confirm is reported after the timeout."""
+    lights = [MockSourceLight("first"), MockSourceLight("second")]
+    entries = await async_setup_entries(
+        hass, lights, {CONF_TRACE: True, CONF_TRACE_TIMEOUT: 1}
+    )
+    events = async_capture_events(hass, EVENT_COMMAND_TRACED)
+    lights[1].error = HomeAssistantError("No response")
+
+    await hass.services.async_call(
+        "light",
+        SERVICE_TURN_ON,
+        {
+            ATTR_ENTITY_ID: [get_proxy_entity_id(hass, entry) for entry in entries],
+            ATTR_BRIGHTNESS: 100,
+        },
+        blocking=True,
+    )
+    await hass.async_block_till_done(wait_background_tasks=True)
+    assert [event.data["entity_ids"] for event in events] == [["light.first"]]
+
+    await asyncio.sleep(1.1)
+    assert len(events) == 2
+    assert events[1].data["confirmed"] is False
+    assert events[1].data["unconfirmed_entity_ids"] == ["light.second"]
+    assert entries[1].runtime_data.pipeline.stats.unconfirmed == 1
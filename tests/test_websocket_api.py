@@ -0,0 +1,76 @@
+"""Tests for the websocket API of the Man in the Middle Light integration."""
+
+from __future__ import annotations
+
+from unittest.mock import patch
+
+from homeassistant.const import ATTR_ENTITY_ID, SERVICE_TURN_ON
+from homeassistant.core import HomeAssistant
+
+from custom_components.mitmili.const import LAYER_OVERRIDE, SUFFIX_OVERRIDDEN
+from pytest_homeassistant_custom_component.typing import WebSocketGenerator
+
+from .conftest import (
+    MockSourceLight,
+    async_setup_entries,
+    get_entity_id,
+    get_proxy_entity_id,
+)
+
+
+async def test_snapshot(
+    hass: HomeAssistant, hass_ws_client: WebSocketGenerator
+) -> None:
+    """Test the state of all entries is returned in one message."""
+    (entry,) = await async_setup_entries(hass, [MockSourceLight("first")])
+    client = await hass_ws_client(hass)
+
+    await client.send_json_auto_id({"type": "mitmili/snapshot"})
+    msg = await client.receive_json()
+
+    assert msg["success"]
+    snapshot = msg["result"]["entries"][entry.entry_id]
+    assert snapshot["title"] == "First"
+    assert snapshot["lights"][0] == get_proxy_entity_id(hass, entry)
+    assert snapshot["overridden"] is False
+    assert snapshot["desired"]["is_on"] is False
+    assert snapshot["actual"]["light.first"]["is_on"] is False
+    assert snapshot["in_sync"] is True
+
+
+async def test_subscribe(
+    hass: HomeAssistant, hass_ws_client: WebSocketGenerator
+) -> None:
+    """Test the entries are pushed, and after that only the changes."""
+    entries = await async_setup_entries(
+        hass, [MockSourceLight("first"), MockSourceLight("second")]
+    )
+    client = await hass_ws_client(hass)
+
+    with patch("custom_components.mitmili.websocket_api._DELTA_WINDOW", 0):
+        await client.send_json_auto_id({"type": "mitmili/subscribe"})
+        msg = await client.receive_json()
+        assert msg["success"]
+        msg = await client.receive_json()
+        assert set(msg["event"]["changed"]) == {entry.entry_id for entry in entries}
+        assert msg["event"]["removed"] == []
+
+        await hass.services.async_call(
+            "switch",
+            SERVICE_TURN_ON,
+            {
+                ATTR_ENTITY_ID: get_entity_id(
+                    hass, entries[0], "switch", SUFFIX_OVERRIDDEN
+                )
+            },
+            blocking=True,
+        )
+        msg = await client.receive_json()
+        assert list(msg["event"]["changed"]) == [entries[0].entry_id]
+        changed = msg["event"]["changed"][entries[0].entry_id]
+        assert changed["overridden"] is True
+        assert changed["active_layer"] == LAYER_OVERRIDE
+
+        assert await hass.config_entries.async_unload(entries[1].entry_id)
+        msg = await client.receive_json()
+        assert msg["event"] == {"changed": {}, "removed": [entries[1].entry_id]}